@@ -41,7 +41,9 @@ if ! echo "${EFFECTIVE_SIZE}" | grep -Eq "^[0-9]+[mMkKgG]?$"; then
     log "Warning: Invalid NGINX_MAX_BODY_SIZE_VALUE. Using default 32M"
     EFFECTIVE_SIZE="32M"
 fi
-sed "s|__NGINX_MAX_BODY_SIZE_CONFIG_VALUE__|${EFFECTIVE_SIZE}|g" \
+EFFECTIVE_UPLOAD_FOLDER="${UPLOAD_FOLDER:-/data/uploads}"
+sed -e "s|__NGINX_MAX_BODY_SIZE_CONFIG_VALUE__|${EFFECTIVE_SIZE}|g" \
+    -e "s|__UPLOAD_FOLDER_CONFIG_VALUE__|${EFFECTIVE_UPLOAD_FOLDER%/}|g" \
     /etc/nginx/conf.d/default.conf.template > /tmp/nginx-default.conf
 
 log "Nginx config prepared (size: ${EFFECTIVE_SIZE})"
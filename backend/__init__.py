@@ -13,6 +13,7 @@ def ensure_owner_exists():
     in case the migration failed. Runs automatically on app startup.
     """
     from .db_handler import get_db_connection, release_db_connection
+    from .schema_registry import schema_registry
     
     conn = None
     try:
@@ -20,13 +21,7 @@ def ensure_owner_exists():
         with conn.cursor() as cur:
             # First check if the is_owner column exists (handles migration timing issue)
             try:
-                cur.execute("""
-                    SELECT column_name FROM information_schema.columns 
-                    WHERE table_name = 'users' AND column_name = 'is_owner'
-                """)
-                column_exists = cur.fetchone() is not None
-                
-                if not column_exists:
+                if not schema_registry.has_column('users', 'is_owner'):
                     logger.info("is_owner column not yet created, skipping owner check (migrations may still be running)")
                     return
                 
@@ -140,6 +135,13 @@ def create_app(config_name=None):
             logger.error(f"Failed to load configuration: {e}")
             raise
     
+    # Let psycopg2 cooperate with gevent workers before the pool opens any connection
+    try:
+        from .db_handler import install_gevent_wait_callback
+    except ImportError:
+        from db_handler import install_gevent_wait_callback
+    install_gevent_wait_callback()
+    
     # Initialize extensions
     try:
         from .extensions import initialize_extensions
@@ -147,6 +149,20 @@ def create_app(config_name=None):
     except ImportError:
         from extensions import initialize_extensions
         initialize_extensions(app)
+
+    # Use the fast JSON provider when available
+    try:
+        from .serialization import init_json_provider
+    except ImportError:
+        from serialization import init_json_provider
+    init_json_provider(app)
+
+    # Return the request-scoped database connection to the pool after each request
+    try:
+        from .db_handler import release_request_connection
+    except ImportError:
+        from db_handler import release_request_connection
+    app.teardown_request(release_request_connection)
     
     # Register Blueprints within app context
     with app.app_context():
@@ -190,6 +206,16 @@ def create_app(config_name=None):
             from oidc_handler import init_oidc_client
             init_oidc_client(app, get_db_connection, release_db_connection)
         
+        # Snapshot the (already migrated) schema once; forked workers inherit it
+        try:
+            from .schema_registry import schema_registry
+        except ImportError:
+            from schema_registry import schema_registry
+        try:
+            schema_registry.refresh()
+        except Exception as e:
+            logger.error(f"Failed to load schema registry, it will be loaded on first use: {e}")
+        
         # Ensure an owner exists on startup
         ensure_owner_exists()
         
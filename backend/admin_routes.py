@@ -1,5 +1,4 @@
 from flask import Blueprint, request, jsonify, current_app
-from datetime import datetime, date
 import os
 import logging
 
@@ -10,14 +9,26 @@ try:
     from .auth_utils import admin_required
     from .apprise_handler import apprise_handler, APPRISE_AVAILABLE
     from .db_handler import get_db_connection, release_db_connection
+    from .site_settings_cache import notify_site_settings_changed
     from .audit_logger import create_audit_log
+    from .serialization import rows_to_dicts
+    from .statistics_cache import statistics_cache
+    from .user_cache import user_cache
+    from .token_revocation import session_registry
+    from .schema_registry import schema_registry
 except ImportError:
     import db_handler
     import notifications
     from auth_utils import admin_required
     from apprise_handler import apprise_handler, APPRISE_AVAILABLE
     from db_handler import get_db_connection, release_db_connection
+    from site_settings_cache import notify_site_settings_changed
     from audit_logger import create_audit_log
+    from serialization import rows_to_dicts
+    from statistics_cache import statistics_cache
+    from user_cache import user_cache
+    from token_revocation import session_registry
+    from schema_registry import schema_registry
 
 # Create the admin blueprint
 admin_bp = Blueprint('admin_bp', __name__)
@@ -39,44 +50,29 @@ def get_all_users():
     try:
         conn = get_db_connection()
         with conn.cursor() as cur:
-            # Try to get users with is_owner column, fall back to without it if column doesn't exist
-            try:
+            # Include is_owner only once its migration has been applied
+            has_owner_column = schema_registry.has_column('users', 'is_owner')
+            if has_owner_column:
                 cur.execute('''
                     SELECT id, username, email, first_name, last_name, is_active, is_admin, is_owner, created_at, last_login 
                     FROM users 
                     ORDER BY created_at DESC
                 ''')
-                users = cur.fetchall()
-                has_owner_column = True
-            except Exception as e:
-                # If the query fails (likely because is_owner column doesn't exist), rollback and try again
-                logger.warning(f"Failed to query with is_owner column in get_all_users, falling back: {e}")
-                conn.rollback()  # Rollback the failed transaction
+            else:
                 cur.execute('''
                     SELECT id, username, email, first_name, last_name, is_active, is_admin, created_at, last_login 
                     FROM users 
                     ORDER BY created_at DESC
                 ''')
-                users = cur.fetchall()
-                has_owner_column = False
+            users = cur.fetchall()
                 
-            columns = [desc[0] for desc in cur.description]
-            users_list = []
+            users_list = rows_to_dicts(cur, users)
             
-            for row in users:
-                user_dict = dict(zip(columns, row))
-                
-                # Add is_owner field if it wasn't included in the query
-                if not has_owner_column:
+            # Add is_owner field if it wasn't included in the query
+            if not has_owner_column:
+                for user_dict in users_list:
                     user_dict['is_owner'] = False
                 
-                # Convert date objects to ISO format strings for JSON serialization
-                for key, value in user_dict.items():
-                    if isinstance(value, (datetime, date)):
-                        user_dict[key] = value.isoformat() if value else None
-                
-                users_list.append(user_dict)
-                
             return jsonify(users_list), 200
     except Exception as e:
         logger.error(f"Error retrieving users: {e}")
@@ -145,6 +141,9 @@ def update_user(user_id):
             
             cur.execute(query, params)
             conn.commit()
+            user_cache.invalidate(user_id)
+            if 'is_active' in data and not data['is_active']:
+                session_registry.revoke_user(user_id)
 
             # Audit log for user updates
             try:
@@ -235,6 +234,8 @@ def delete_user(user_id):
             logger.info(f"Deleted user {user_id}, affected rows: {user_deleted}")
             
             conn.commit()
+            user_cache.invalidate(user_id)
+            session_registry.revoke_user(user_id)
             logger.info(f"User {user_id} deleted successfully")
 
             # Audit log for user deletion
@@ -304,6 +305,7 @@ def transfer_ownership():
                 return jsonify({"message": "Ownership transfer feature is not available. Please run the database migration first."}), 500
             
             conn.commit()
+            user_cache.invalidate(current_owner_id, new_owner_id)
             
             logger.info(f"Ownership successfully transferred from {current_owner_id} to {new_owner_id}.")
             return jsonify({"message": "Ownership transferred successfully."}), 200
@@ -347,13 +349,7 @@ def get_site_settings():
         conn = get_db_connection()
         with conn.cursor() as cur:
             # Check if settings table exists
-            cur.execute("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_name = 'site_settings'
-                )
-            """)
-            table_exists = cur.fetchone()[0]
+            table_exists = schema_registry.has_table('site_settings')
             
             # Create settings table if it doesn't exist
             if not table_exists:
@@ -365,6 +361,7 @@ def get_site_settings():
                     )
                 """)
                 conn.commit()
+                schema_registry.invalidate()
             
             # Get all settings
             cur.execute('SELECT key, value FROM site_settings')
@@ -428,7 +425,9 @@ def get_site_settings():
             settings_to_return['paperless_api_token_set'] = bool(raw_settings.get('paperless_api_token'))
 
             if needs_commit:
+                notify_site_settings_changed(cur)
                 conn.commit()
+                db_handler.site_settings_cache.invalidate()
             
             return jsonify(settings_to_return), 200
     except Exception as e:
@@ -449,13 +448,7 @@ def update_site_settings():
         conn = get_db_connection()
         with conn.cursor() as cur:
             # Check if settings table exists
-            cur.execute("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_name = 'site_settings'
-                )
-            """)
-            table_exists = cur.fetchone()[0]
+            table_exists = schema_registry.has_table('site_settings')
             
             # Create settings table if it doesn't exist
             if not table_exists:
@@ -466,6 +459,7 @@ def update_site_settings():
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 """)
+                schema_registry.invalidate()
             
             # Update settings
             updated_keys = []
@@ -496,7 +490,9 @@ def update_site_settings():
                 """, (key, str(value))) # Ensure value is string
                 updated_keys.append(key)
             
+            notify_site_settings_changed(cur)
             conn.commit()
+            db_handler.site_settings_cache.invalidate()
             
             response_message = "Settings updated successfully."
             oidc_settings_changed = any(k.startswith('oidc_') for k in updated_keys)
@@ -605,6 +601,33 @@ def get_scheduler_status():
         logger.error(f"Error getting scheduler status: {e}")
         return jsonify({'error': f'Failed to get scheduler status: {str(e)}'}), 500
 
+@admin_bp.route('/statistics-cache', methods=['GET'])
+@admin_required
+def get_statistics_cache_status():
+    """Get hit/miss counters of this worker's statistics cache (admin only)"""
+    return jsonify(statistics_cache.stats()), 200
+
+@admin_bp.route('/user-cache', methods=['GET'])
+@admin_required
+def get_user_cache_status():
+    """Get hit/miss counters of this worker's authenticated-user cache and stateless session registry (admin only)"""
+    return jsonify(dict(user_cache.stats(), stateless_sessions=session_registry.stats())), 200
+
+@admin_bp.route('/site-settings-cache', methods=['GET'])
+@admin_required
+def get_site_settings_cache_status():
+    """Get load/notification counters of this worker's site settings cache (admin only)"""
+    return jsonify(db_handler.site_settings_cache.stats()), 200
+
+@admin_bp.route('/db-pool', methods=['GET'])
+@admin_required
+def get_db_pool_status():
+    """Get connection pool gauges, checkout wait histogram, timeouts and per-route checkout accounting of this worker (admin only)"""
+    stats = db_handler.get_pool_stats()
+    if stats is None:
+        return jsonify({'message': 'Database connection pool is not initialized in this worker'}), 503
+    return jsonify(stats), 200
+
 # ============================
 # Apprise Admin Routes
 # ============================
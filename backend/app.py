@@ -61,4 +61,5 @@ except Exception as e:
 
 if __name__ == '__main__':
     # This is only for local development
+    db_handler.site_settings_cache.enable_listener()
     app.run(debug=True, host='0.0.0.0', port=5000)
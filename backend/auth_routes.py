@@ -14,20 +14,28 @@ from psycopg2.extras import Json
 # Use relative imports for project modules
 try:
     from . import db_handler, notifications
-    from .auth_utils import generate_token, token_required, is_valid_email, is_valid_password
+    from .auth_utils import token_required, is_valid_email, is_valid_password, issue_session_tokens, decode_token_payload, generate_access_token, load_token_claims
     from .localization import SUPPORTED_LANGUAGES
+    from .change_tracking import bump_user_data_version
+    from .user_cache import user_cache
+    from .token_revocation import session_registry
+    from .schema_registry import schema_registry
 except ImportError:
     # Fallback for development environment
     import db_handler, notifications
-    from auth_utils import generate_token, token_required, is_valid_email, is_valid_password
+    from auth_utils import token_required, is_valid_email, is_valid_password, issue_session_tokens, decode_token_payload, generate_access_token, load_token_claims
     from localization import SUPPORTED_LANGUAGES
+    from change_tracking import bump_user_data_version
+    from user_cache import user_cache
+    from token_revocation import session_registry
+    from schema_registry import schema_registry
 
-# Import bcrypt from extensions since it's initialized with the app
+# bcrypt work runs off the gevent hub (see password_hashing)
 try:
-    from .extensions import bcrypt
+    from .password_hashing import hash_password, check_password
 except ImportError:
     # Fallback for development environment
-    from extensions import bcrypt
+    from password_hashing import hash_password, check_password
 
 auth_bp = Blueprint('auth_bp', __name__)
 
@@ -41,13 +49,7 @@ def register():
         conn = db_handler.get_db_connection()
         with conn.cursor() as cur:
             # Check if settings table exists
-            cur.execute("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_name = 'site_settings'
-                )
-            """)
-            table_exists = cur.fetchone()[0]
+            table_exists = schema_registry.has_table('site_settings')
             
             registration_enabled = True
             if table_exists:
@@ -87,7 +89,7 @@ def register():
             return jsonify({'message': 'Password must be at least 8 characters and include uppercase, lowercase, and numbers!'}), 400
         
         # Hash the password
-        password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        password_hash = hash_password(password)
         
         with conn.cursor() as cur:
             # Check if username or email already exists
@@ -114,8 +116,9 @@ def register():
             if is_owner:
                 current_app.logger.info(f"✅ First user registered: {username} ({email}) - automatically set as admin and owner")
             
-            # Generate token
-            token = generate_token(user_id)
+            # Generate token(s) for a new session
+            session_token = str(uuid.uuid4())
+            token, refresh_token = issue_session_tokens(cur, user_id, session_token)
             
             # Update last login
             cur.execute('UPDATE users SET last_login = %s WHERE id = %s', (datetime.now(UTC), user_id))
@@ -123,7 +126,6 @@ def register():
             # Store session info
             ip_address = request.remote_addr
             user_agent = request.headers.get('User-Agent', '')
-            session_token = str(uuid.uuid4())
             expires_at = datetime.now(UTC) + current_app.config['JWT_EXPIRATION_DELTA']
             
             cur.execute(
@@ -133,7 +135,7 @@ def register():
             
             conn.commit()
             
-            return jsonify({
+            response_data = {
                 'message': 'User registered successfully!',
                 'token': token,
                 'user': {
@@ -142,7 +144,10 @@ def register():
                     'email': email,
                     'is_admin': is_admin
                 }
-            }), 201
+            }
+            if refresh_token:
+                response_data['refresh_token'] = refresh_token
+            return jsonify(response_data), 201
     except Exception as e:
         current_app.logger.error(f"Registration error: {e}")
         if conn:
@@ -171,7 +176,7 @@ def login():
             cur.execute('SELECT id, username, email, password_hash, is_active, is_admin FROM users WHERE username = %s OR email = %s', (username, username))
             user = cur.fetchone()
             
-            if not user or not bcrypt.check_password_hash(user[3], password):
+            if not user or not check_password(user[3], password):
                 return jsonify({'message': 'Invalid username or password!'}), 401
             
             if not user[4]:  # is_active
@@ -179,8 +184,9 @@ def login():
             
             user_id = user[0]
             
-            # Generate token
-            token = generate_token(user_id)
+            # Generate token(s) for a new session
+            session_token = str(uuid.uuid4())
+            token, refresh_token = issue_session_tokens(cur, user_id, session_token)
             
             # Update last login
             cur.execute('UPDATE users SET last_login = %s WHERE id = %s', (datetime.now(UTC), user_id))
@@ -188,7 +194,6 @@ def login():
             # Store session info
             ip_address = request.remote_addr
             user_agent = request.headers.get('User-Agent', '')
-            session_token = str(uuid.uuid4())
             expires_at = datetime.now(UTC) + current_app.config['JWT_EXPIRATION_DELTA']
             
             cur.execute(
@@ -198,7 +203,7 @@ def login():
             
             conn.commit()
             
-            return jsonify({
+            response_data = {
                 'message': 'Login successful!',
                 'token': token,
                 'user': {
@@ -208,7 +213,10 @@ def login():
                     'is_admin': user[5],
                     'oidc_managed': False
                 }
-            }), 200
+            }
+            if refresh_token:
+                response_data['refresh_token'] = refresh_token
+            return jsonify(response_data), 200
     except Exception as e:
         current_app.logger.error(f"Login error: {e}")
         if conn:
@@ -236,6 +244,7 @@ def logout():
             # Invalidate all sessions for this user
             cur.execute('DELETE FROM user_sessions WHERE user_id = %s', (user_id,))
             conn.commit()
+            session_registry.revoke_user(user_id)
             
             return jsonify({'message': 'Logout successful!'}), 200
     except Exception as e:
@@ -247,6 +256,42 @@ def logout():
         if conn:
             db_handler.release_db_connection(conn)
 
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh_token():
+    """Exchange a refresh token for a new stateless access token (STATELESS_JWT mode)"""
+    if not current_app.config.get('STATELESS_JWT'):
+        return jsonify({'message': 'Token refresh is not enabled'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    payload = decode_token_payload(data.get('refresh_token') or '')
+    if not payload or payload.get('typ') != 'refresh':
+        return jsonify({'message': 'Invalid or expired refresh token!'}), 401
+    
+    conn = None
+    try:
+        conn = db_handler.get_db_connection()
+        with conn.cursor() as cur:
+            # The session must still exist (not logged out, deleted or expired)
+            cur.execute(
+                'SELECT 1 FROM user_sessions WHERE user_id = %s AND session_token = %s AND expires_at > %s',
+                (payload['sub'], payload.get('sid'), datetime.now(UTC))
+            )
+            if not cur.fetchone():
+                return jsonify({'message': 'Session has ended, please log in again'}), 401
+            
+            # Reload claims so role changes and deactivations take effect on refresh
+            user = load_token_claims(cur, payload['sub'])
+            if user is None:
+                return jsonify({'message': 'User not found or inactive!'}), 401
+        
+        return jsonify({'token': generate_access_token(user, payload['sid'])}), 200
+    except Exception as e:
+        current_app.logger.error(f"Token refresh error: {e}")
+        return jsonify({'message': 'Token refresh failed!'}), 500
+    finally:
+        if conn:
+            db_handler.release_db_connection(conn)
+
 @auth_bp.route('/validate-token', methods=['GET'])
 @token_required
 def validate_token():
@@ -487,6 +532,7 @@ def update_profile():
                 return jsonify({'message': 'User not found'}), 404
 
             conn.commit()
+            user_cache.invalidate(user_id)
 
             user = {
                 'id': user_data[0],
@@ -563,6 +609,8 @@ def delete_account():
             
             # Commit transaction
             cursor.execute("COMMIT")
+            user_cache.invalidate(user_id)
+            session_registry.revoke_user(user_id)
             
             return jsonify({'message': 'Account deleted successfully'}), 200
             
@@ -582,13 +630,7 @@ def delete_account():
 def has_currency_symbol_column(cursor):
     """Check if user_preferences table has currency_symbol column"""
     try:
-        cursor.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='user_preferences' 
-            AND column_name='currency_symbol'
-        """)
-        return cursor.fetchone() is not None
+        return schema_registry.has_column('user_preferences', 'currency_symbol')
     except Exception:
         return False
 
@@ -610,13 +652,7 @@ def check_registration_status():
         conn = db_handler.get_db_connection()
         with conn.cursor() as cur:
             # Check if settings table exists
-            cur.execute("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_name = 'site_settings'
-                )
-            """)
-            table_exists = cur.fetchone()[0]
+            table_exists = schema_registry.has_table('site_settings')
             
             if not table_exists:
                 # If table doesn't exist, registration is enabled by default
@@ -668,7 +704,7 @@ def reset_password():
             user_id = token_info[0]
             
             # Hash the new password
-            password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+            password_hash = hash_password(password)
             
             # Update user's password
             cur.execute('UPDATE users SET password_hash = %s WHERE id = %s', (password_hash, user_id))
@@ -719,11 +755,11 @@ def change_password():
             current_password_hash = user_data[0]
             
             # Verify the current password
-            if not bcrypt.check_password_hash(current_password_hash, current_password):
+            if not check_password(current_password_hash, current_password):
                 return jsonify({'message': 'Incorrect current password!'}), 401
             
             # Hash the new password
-            new_password_hash = bcrypt.generate_password_hash(new_password).decode('utf-8')
+            new_password_hash = hash_password(new_password)
             
             # Update the password in the database
             cur.execute('UPDATE users SET password_hash = %s WHERE id = %s', (new_password_hash, user_id))
@@ -821,13 +857,7 @@ def get_preferences():
         
         try:
             # Check if user_preferences table exists
-            cursor.execute("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_name = 'user_preferences'
-                )
-            """)
-            table_exists = cursor.fetchone()[0]
+            table_exists = schema_registry.has_table('user_preferences')
             
             if not table_exists:
                 # Return default preferences if table doesn't exist
@@ -1073,6 +1103,10 @@ def update_preferences():
                 if preferred_language is not None:
                     cursor.execute("UPDATE users SET preferred_language = %s WHERE id = %s", (preferred_language, user_id))
             
+            # expiring_soon_days changes the statistics and status buckets, so invalidate cached reads
+            if expiring_soon_days is not None:
+                bump_user_data_version(cursor, user_id)
+            
             conn.commit()
             
             # Return updated preferences with language preference
@@ -1175,7 +1209,7 @@ def request_email_change():
 
         current_password_hash, current_email = user_data
 
-        if not bcrypt.check_password_hash(current_password_hash, password):
+        if not check_password(current_password_hash, password):
             return jsonify({'message': 'Incorrect password'}), 401
             
         if new_email.lower() == current_email.lower():
@@ -1190,6 +1224,7 @@ def request_email_change():
         # In a production system, you would implement email verification here
         cur.execute("UPDATE users SET email = %s WHERE id = %s", (new_email, current_user_id))
         conn.commit()
+        user_cache.invalidate(current_user_id)
 
         return jsonify({'message': 'Email address updated successfully.'}), 200
 
@@ -8,8 +8,17 @@ import re
 # IMPORTANT: We need to import db_handler here for the decorators
 try:
     from . import db_handler
+    from .user_cache import user_cache
+    from .token_revocation import session_registry
+    from .schema_registry import schema_registry
 except ImportError:
     import db_handler
+    from user_cache import user_cache
+    from token_revocation import session_registry
+    from schema_registry import schema_registry
+
+# Claims embedded in stateless access tokens, in request.user order
+STATELESS_USER_CLAIMS = ('username', 'email', 'is_admin', 'is_owner', 'oidc_managed')
 
 def generate_token(user_id):
     """Generate a JWT token for the user"""
@@ -20,16 +29,76 @@ def generate_token(user_id):
     }
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
-def decode_token(token):
-    """Decode a JWT token and return the user_id"""
+def generate_access_token(user, session_token):
+    """Generate a short-lived stateless access token carrying the user's claims (STATELESS_JWT mode)"""
+    now = datetime.now(UTC)
+    payload = {
+        'exp': now + current_app.config['STATELESS_JWT_ACCESS_DELTA'],
+        'iat': now,
+        'sub': str(user['id']),
+        'typ': 'access',
+        'sid': session_token
+    }
+    payload.update({claim: user.get(claim) for claim in STATELESS_USER_CLAIMS})
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+def generate_refresh_token(user_id, session_token):
+    """Generate a refresh token bound to a user_sessions row (STATELESS_JWT mode)"""
+    now = datetime.now(UTC)
+    payload = {
+        'exp': now + current_app.config['JWT_EXPIRATION_DELTA'],
+        'iat': now,
+        'sub': str(user_id),
+        'typ': 'refresh',
+        'sid': session_token
+    }
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+def load_token_claims(cur, user_id):
+    """Load the user fields embedded in stateless access tokens, or None if the user is missing or inactive"""
+    cur.execute('SELECT id, username, email, is_admin, is_owner, oidc_sub FROM users WHERE id = %s AND is_active = TRUE', (user_id,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    return {
+        'id': row[0],
+        'username': row[1],
+        'email': row[2],
+        'is_admin': row[3],
+        'is_owner': row[4],
+        'oidc_managed': row[5] is not None
+    }
+
+def issue_session_tokens(cur, user_id, session_token):
+    """Return (token, refresh_token) for a new login session.
+
+    In STATELESS_JWT mode this is a short-lived access token with embedded
+    claims plus a refresh token for session_token; otherwise the regular
+    token and None.
+    """
+    if not current_app.config.get('STATELESS_JWT'):
+        return generate_token(user_id), None
+    user = load_token_claims(cur, user_id)
+    if user is None:
+        return generate_token(user_id), None
+    return generate_access_token(user, session_token), generate_refresh_token(user_id, session_token)
+
+def decode_token_payload(token):
+    """Decode a JWT token and return its payload, or None if it is expired or invalid"""
     try:
-        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        return payload['sub']
+        return jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
         return None  # Token has expired
     except jwt.InvalidTokenError:
         return None  # Invalid token
 
+def decode_token(token):
+    """Decode a JWT token and return the user_id"""
+    payload = decode_token_payload(token)
+    if not payload or payload.get('typ') == 'refresh':
+        return None  # Refresh tokens only authenticate /auth/refresh
+    return payload['sub']
+
 def token_required(f):
     """Decorator to protect routes that require authentication"""
     @wraps(f)
@@ -55,28 +124,39 @@ def token_required(f):
             return jsonify({'message': 'Authentication token is missing!'}), 401
         
         # Decode the token
-        user_id = decode_token(token)
-        if not user_id:
+        payload = decode_token_payload(token)
+        if not payload or payload.get('typ') == 'refresh':
             current_app.logger.warning(f"Invalid token used for: {request.path}")
             return jsonify({'message': 'Invalid or expired token!'}), 401
+        user_id = payload['sub']
         
-        # Check if user exists
+        # Stateless access tokens carry the user's claims; only the session has to be live
+        if payload.get('typ') == 'access' and current_app.config.get('STATELESS_JWT'):
+            if not session_registry.is_live(user_id, payload.get('sid'), db_handler.get_db_connection, db_handler.release_db_connection):
+                current_app.logger.warning(f"Revoked token used for: {request.path}")
+                return jsonify({'message': 'Invalid or expired token!'}), 401
+            request.user = {'id': int(user_id)}
+            request.user.update({claim: payload.get(claim) for claim in STATELESS_USER_CLAIMS})
+            return f(*args, **kwargs)
+        
+        # Recently resolved users skip the database lookup entirely
+        cached_user = user_cache.get(user_id)
+        if cached_user is not None:
+            request.user = cached_user
+            return f(*args, **kwargs)
+        
+        # Check if user exists (on the request-scoped connection, released at teardown)
         conn = None
         try:
             conn = db_handler.get_db_connection()
             with conn.cursor() as cur:
-                # Try to get user with is_owner column, fall back to without it if column doesn't exist
-                try:
+                # Include is_owner/oidc_sub only once their migrations have been applied
+                has_owner_column = schema_registry.has_column('users', 'is_owner')
+                if has_owner_column:
                     cur.execute('SELECT id, username, email, is_admin, is_owner, oidc_sub FROM users WHERE id = %s AND is_active = TRUE', (user_id,))
-                    user = cur.fetchone()
-                    has_owner_column = True
-                except Exception as e:
-                    # If the query fails (likely because is_owner column doesn't exist), rollback and try again
-                    current_app.logger.warning(f"Failed to query with is_owner column, falling back: {e}")
-                    conn.rollback()  # Rollback the failed transaction
+                else:
                     cur.execute('SELECT id, username, email, is_admin FROM users WHERE id = %s AND is_active = TRUE', (user_id,))
-                    user = cur.fetchone()
-                    has_owner_column = False
+                user = cur.fetchone()
                 
                 if not user:
                     return jsonify({'message': 'User not found or inactive!'}), 401
@@ -94,8 +174,12 @@ def token_required(f):
                         'is_owner': user[4],
                         'oidc_managed': user[5] is not None
                     })
-                
-                return f(*args, **kwargs)
+                user_cache.set(user_id, request.user)
+            
+            # The view shares this request-scoped connection; end the lookup's
+            # read transaction so it starts from a clean state
+            conn.rollback()
+            return f(*args, **kwargs)
         except Exception as e:
             current_app.logger.error(f"Authentication error: {e}")
             return jsonify({'message': 'Authentication error!'}), 500
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# backend/benchmarks/bcrypt_offload_bench.py
+"""
+Latency of other greenlets while logins hash passwords under gevent.
+
+Monkey patches the process the way gunicorn_config.py does, then runs a
+number of greenlets that loop over password_hashing.check_password() (and
+hash_password() every fourth call) next to a probe greenlet. The probe sleeps
+for a short interval and records how late it wakes up, which is the delay any
+other request in the same worker would see. Each run is done with the bcrypt
+calls inline on the event loop and on the BCRYPT_MAX_CONCURRENCY thread pool,
+after a baseline with no logins; p50/p99/max probe delay and login throughput
+are reported. Needs gevent and the backend requirements, but no database.
+
+Run from the repository root:  python backend/benchmarks/bcrypt_offload_bench.py [logins] [seconds]
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import math  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import password_hashing  # noqa: E402
+
+PROBE_INTERVAL = 0.005
+PASSWORD = 'correct horse battery staple'
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+def probe(deadline, delays):
+    """Sleep PROBE_INTERVAL in a loop and record how late each wake-up is, in milliseconds."""
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        gevent.sleep(PROBE_INTERVAL)
+        delays.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+def login(deadline, password_hash, counts):
+    while time.perf_counter() < deadline:
+        if counts['calls'] % 4 == 3:
+            password_hashing.hash_password(PASSWORD)
+        else:
+            assert password_hashing.check_password(password_hash, PASSWORD)
+        counts['calls'] += 1
+
+def run(logins, seconds, use_threadpool):
+    get_threadpool = password_hashing._get_threadpool
+    if not use_threadpool:
+        password_hashing._get_threadpool = lambda: None
+    try:
+        password_hash = password_hashing.hash_password(PASSWORD)
+        delays = []
+        counts = {'calls': 0}
+        deadline = time.perf_counter() + seconds
+        greenlets = [gevent.spawn(probe, deadline, delays)]
+        greenlets += [gevent.spawn(login, deadline, password_hash, counts) for _ in range(logins)]
+        gevent.joinall(greenlets, raise_error=True)
+    finally:
+        password_hashing._get_threadpool = get_threadpool
+    return delays, counts['calls'] / seconds
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    print(f"{logins} concurrent logins for {seconds:.0f}s each, probe every {PROBE_INTERVAL * 1000:.0f} ms, "
+          f"BCRYPT_MAX_CONCURRENCY={password_hashing.BCRYPT_MAX_CONCURRENCY}")
+    for label, count, use_threadpool in (('no logins', 0, True), ('inline', logins, False), ('threadpool', logins, True)):
+        delays, rate = run(count, seconds, use_threadpool)
+        print(f"  {label:<12} probe delay p50 {percentile(delays, 50):7.1f} ms  p99 {percentile(delays, 99):7.1f} ms  "
+              f"max {max(delays):7.1f} ms  ({len(delays)} samples)  {rate:6.1f} bcrypt calls/s")
+
+if __name__ == '__main__':
+    main()
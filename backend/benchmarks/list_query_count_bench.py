@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# backend/benchmarks/list_query_count_bench.py
+"""
+Checks that the warranty list code path issues a constant number of queries.
+
+The personal list endpoints build their payload with rows_to_dicts() and then
+attach_serials_and_tags(). This script runs that path against a cursor stub
+that counts execute() calls, for lists of 10, 1,000 and 5,000 warranties, and
+asserts the count does not grow with the number of rows. Needs no database,
+but imports the backend modules (Flask, psycopg2 and the other requirements).
+
+Run from the repository root:  python backend/benchmarks/list_query_count_bench.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import rows_to_dicts  # noqa: E402
+from warranties_routes import attach_serials_and_tags  # noqa: E402
+
+SIZES = (10, 1000, 5000)
+
+class CountingCursor:
+    """Cursor stub answering the list queries and counting execute() calls."""
+
+    def __init__(self, warranty_ids):
+        self.warranty_ids = warranty_ids
+        self.description = [('id', 23, None, None, None, None, None), ('product_name', 25, None, None, None, None, None)]
+        self.executes = 0
+        self._rows = []
+
+    def execute(self, query, params=None):
+        self.executes += 1
+        if 'FROM serial_numbers' in query:
+            self._rows = [(warranty_id, f"SN-{warranty_id}-{n}") for warranty_id in self.warranty_ids for n in range(2)]
+        elif 'FROM tags' in query:
+            self._rows = [(warranty_id, 1, 'Electronics', '#3498db') for warranty_id in self.warranty_ids]
+        else:
+            self._rows = [(warranty_id, f"Product {warranty_id}") for warranty_id in self.warranty_ids]
+
+    def fetchall(self):
+        return self._rows
+
+def run_list(size, include_serials=True, include_tags=True):
+    cur = CountingCursor(list(range(1, size + 1)))
+    cur.execute('SELECT w.id, w.product_name FROM warranties w WHERE w.user_id = %s', (1,))
+    warranties_list = rows_to_dicts(cur, cur.fetchall())
+    attach_serials_and_tags(cur, warranties_list, include_serials, include_tags)
+    assert len(warranties_list) == size
+    if include_serials:
+        assert all(len(w['serial_numbers']) == 2 for w in warranties_list)
+    if include_tags:
+        assert all(len(w['tags']) == 1 for w in warranties_list)
+    return cur.executes
+
+def main():
+    for include_serials, include_tags in ((True, True), (True, False), (False, True), (False, False)):
+        counts = {}
+        for size in SIZES:
+            started = time.perf_counter()
+            counts[size] = run_list(size, include_serials, include_tags)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"serials={include_serials!s:<5} tags={include_tags!s:<5} rows={size:>5}: "
+                  f"{counts[size]} queries, {elapsed_ms:.1f} ms")
+        assert len(set(counts.values())) == 1, f"query count grows with list size: {counts}"
+    print("OK: query count is independent of the number of warranties")
+
+if __name__ == '__main__':
+    main()
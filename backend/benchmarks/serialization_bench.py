@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# backend/benchmarks/serialization_bench.py
+"""
+Micro-benchmark of warranty row serialization; needs no database.
+
+Compares the former per-value isinstance conversion with
+serialization.rows_to_dicts() on 10,000 fake warranty rows (with a matching
+fake cursor.description), and times JSON encoding of the result with the
+standard json module and, when installed, orjson.
+
+Run from the repository root:  python backend/benchmarks/serialization_bench.py [rows]
+"""
+import json
+import os
+import sys
+import timeit
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import (  # noqa: E402
+    DATE_OID, NUMERIC_OID, TIMESTAMPTZ_OID, ORJSON_AVAILABLE, rows_to_dicts
+)
+
+INT4_OID = 23
+TEXT_OID = 25
+BOOL_OID = 16
+
+# (name, type_code) pairs shaped like the warranty list query
+COLUMNS = (
+    ('id', INT4_OID), ('product_name', TEXT_OID), ('purchase_date', DATE_OID),
+    ('expiration_date', DATE_OID), ('invoice_path', TEXT_OID), ('manual_path', TEXT_OID),
+    ('other_document_path', TEXT_OID), ('product_url', TEXT_OID), ('notes', TEXT_OID),
+    ('purchase_price', NUMERIC_OID), ('user_id', INT4_OID), ('created_at', TIMESTAMPTZ_OID),
+    ('updated_at', TIMESTAMPTZ_OID), ('is_lifetime', BOOL_OID), ('vendor', TEXT_OID),
+    ('warranty_type', TEXT_OID), ('warranty_duration_years', INT4_OID),
+    ('warranty_duration_months', INT4_OID), ('warranty_duration_days', INT4_OID),
+    ('product_photo_path', TEXT_OID), ('currency', TEXT_OID), ('model_number', TEXT_OID),
+)
+
+class FakeCursor:
+    """Just enough of a psycopg2 cursor for rows_to_dicts()."""
+
+    def __init__(self, columns):
+        # psycopg2 description entries are 7-tuples: (name, type_code, ...)
+        self.description = [(name, type_code, None, None, None, None, None) for name, type_code in columns]
+
+def make_rows(count):
+    now = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+    return [
+        (
+            i, f"Product {i}", date(2024, 1, 1 + i % 28), date(2027, 1, 1 + i % 28),
+            f"uploads/20240101000000_invoice_{i}.pdf", None, None, "https://example.com/product",
+            "Some notes", Decimal('199.99'), 1 + i % 5, now, now, False, "Vendor",
+            "Standard", 3, 0, 0, f"uploads/20240101000000_photo_{i}.jpg", "USD", f"M-{i}",
+        )
+        for i in range(count)
+    ]
+
+def legacy_rows_to_dicts(cur, rows):
+    """The per-value conversion loop rows_to_dicts() replaced."""
+    columns = [desc[0] for desc in cur.description]
+    result = []
+    for row in rows:
+        row_dict = dict(zip(columns, row))
+        for key, value in row_dict.items():
+            if isinstance(value, (datetime, date)):
+                row_dict[key] = value.isoformat()
+            elif isinstance(value, Decimal):
+                row_dict[key] = float(value)
+        result.append(row_dict)
+    return result
+
+def best_of(func, repeat=5):
+    """Best wall time of one call, in milliseconds."""
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    cur = FakeCursor(COLUMNS)
+    rows = make_rows(count)
+
+    assert legacy_rows_to_dicts(cur, rows) == rows_to_dicts(cur, rows)
+    dicts = rows_to_dicts(cur, rows)
+
+    results = [
+        ('legacy isinstance loop', best_of(lambda: legacy_rows_to_dicts(cur, rows))),
+        ('rows_to_dicts', best_of(lambda: rows_to_dicts(cur, rows))),
+        ('json.dumps', best_of(lambda: json.dumps(dicts))),
+    ]
+    if ORJSON_AVAILABLE:
+        import orjson
+        results.append(('orjson.dumps', best_of(lambda: orjson.dumps(dicts))))
+    else:
+        print("orjson not installed, skipping orjson timing")
+
+    print(f"{count} rows, {len(COLUMNS)} columns (best of 5)")
+    for label, ms in results:
+        print(f"  {label:<24} {ms:8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+# backend/byte_ranges.py
+"""
+HTTP Range requests (RFC 9110, section 14) for file downloads.
+
+Only the "bytes" unit is supported. A single satisfiable range is answered
+with 206 and Content-Range, several ranges with a multipart/byteranges body,
+and a Range header none of whose ranges overlap the file with 416. Headers
+that cannot be parsed, or that ask for more than MAX_RANGES ranges, are
+ignored and the whole file is sent, as the RFC allows.
+"""
+import os
+import secrets
+import logging
+
+from flask import Response, jsonify
+from werkzeug.http import parse_range_header
+
+logger = logging.getLogger(__name__)
+
+# Chunk size used when the app streams file content itself
+FILE_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Larger range sets are ignored (whole file sent) to avoid tiny-read amplification
+MAX_RANGES = 16
+
+def resolve_byte_ranges(range_header, size):
+    """
+    Resolve a Range header against a representation of the given size.
+
+    Returns None when the header should be ignored, an empty list when no
+    range is satisfiable (416), or a list of (start, stop) offsets with stop
+    exclusive.
+    """
+    if not range_header:
+        return None
+    parsed = parse_range_header(range_header)
+    if parsed is None or parsed.units != 'bytes' or not parsed.ranges:
+        return None
+    if len(parsed.ranges) > MAX_RANGES:
+        logger.info(f"Ignoring Range header with {len(parsed.ranges)} ranges")
+        return None
+
+    ranges = []
+    for start, stop in parsed.ranges:
+        if start < 0:
+            # Suffix range: the last -start bytes
+            if size == 0:
+                continue
+            ranges.append((max(size + start, 0), size))
+        elif start < size:
+            ranges.append((start, size if stop is None else min(stop, size)))
+    return ranges
+
+def content_range(start, stop, size):
+    return f"bytes {start}-{stop - 1}/{size}"
+
+def _read_file_range(path, start, stop):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = f.read(min(FILE_STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def range_not_satisfiable_response(size):
+    response = jsonify({"message": "Requested range not satisfiable"})
+    response.status_code = 416
+    response.headers['Content-Range'] = f"bytes */{size}"
+    return response
+
+def file_response(path, size, mimetype, headers, range_header=None):
+    """
+    Build a streaming response for a local file, honouring range_header.
+
+    headers are added to every response (e.g. Content-Disposition, Cache-Control).
+    """
+    headers = dict(headers)
+    headers['Accept-Ranges'] = 'bytes'
+    ranges = resolve_byte_ranges(range_header, size)
+
+    if ranges is None:
+        headers['Content-Length'] = str(size)
+        return Response(_read_file_range(path, 0, size), mimetype=mimetype, headers=headers)
+
+    if not ranges:
+        logger.info(f"Unsatisfiable range '{range_header}' for {os.path.basename(path)} ({size} bytes)")
+        response = range_not_satisfiable_response(size)
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
+
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        headers['Content-Range'] = content_range(start, stop, size)
+        headers['Content-Length'] = str(stop - start)
+        return Response(_read_file_range(path, start, stop), status=206, mimetype=mimetype, headers=headers)
+
+    # Several ranges: multipart/byteranges, each part with its own Content-Range
+    boundary = secrets.token_hex(16)
+    part_headers = [
+        (f"\r\n--{boundary}\r\n"
+         f"Content-Type: {mimetype}\r\n"
+         f"Content-Range: {content_range(start, stop, size)}\r\n\r\n").encode('latin-1')
+        for start, stop in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode('latin-1')
+    length = sum(len(part) for part in part_headers) + sum(stop - start for start, stop in ranges) + len(closing)
+
+    def generate():
+        for part_header, (start, stop) in zip(part_headers, ranges):
+            yield part_header
+            yield from _read_file_range(path, start, stop)
+        yield closing
+
+    headers['Content-Length'] = str(length)
+    return Response(generate(), status=206, content_type=f"multipart/byteranges; boundary={boundary}", headers=headers)
+
+def slice_chunks(chunks, start, stop):
+    """Yield bytes [start, stop) of a stream given as an iterable of chunks."""
+    offset = 0
+    for chunk in chunks:
+        chunk_end = offset + len(chunk)
+        if chunk_end > start:
+            yield chunk[max(start - offset, 0):stop - offset]
+        offset = chunk_end
+        if offset >= stop:
+            break
@@ -0,0 +1,135 @@
+# backend/change_tracking.py
+"""
+Change tracking helpers for warranty data.
+
+- Per-user data versions for conditional GET (weak ETag / 304) on list endpoints.
+  Every write that changes what a user sees in their warranty, tag or statistics
+  views bumps that user's counter inside the same transaction.
+- Sync tokens for delta sync (GET /warranties/changes), built on warranties.updated_at,
+  warranties.archived_at and the warranty_deletions log.
+"""
+import base64
+import logging
+from datetime import datetime
+
+from flask import request, Response
+
+try:
+    from .statistics_cache import statistics_cache
+except ImportError:
+    from statistics_cache import statistics_cache
+
+logger = logging.getLogger(__name__)
+
+# Tombstones older than this are purged; clients with an older token must resync fully
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+def bump_user_data_version(cur, user_id):
+    """Increment the data version of a user. Must run in the writing transaction.
+
+    Also drops the user's cached statistics in this worker.
+    """
+    cur.execute("""
+        INSERT INTO user_data_versions (user_id, version, updated_at)
+        VALUES (%s, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id)
+        DO UPDATE SET version = user_data_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+    """, (user_id,))
+    statistics_cache.invalidate_user(user_id)
+
+def bump_warranty_owner_data_version(cur, warranty_id):
+    """Increment the data version of the user owning a warranty (admin edits included)."""
+    cur.execute("""
+        INSERT INTO user_data_versions (user_id, version, updated_at)
+        SELECT user_id, 1, CURRENT_TIMESTAMP FROM warranties WHERE id = %s
+        ON CONFLICT (user_id)
+        DO UPDATE SET version = user_data_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+        RETURNING user_id
+    """, (warranty_id,))
+    result = cur.fetchone()
+    if result:
+        statistics_cache.invalidate_user(result[0])
+
+def get_user_data_version(cur, user_id):
+    """Return the current data version of a user (0 if the user never wrote anything)."""
+    cur.execute("SELECT version FROM user_data_versions WHERE user_id = %s", (user_id,))
+    result = cur.fetchone()
+    return result[0] if result else 0
+
+def user_data_etag(user_id, version, *extra):
+    """Build the (unquoted) weak ETag value for a user's data version."""
+    return '-'.join(str(part) for part in (user_id, version) + extra)
+
+def not_modified_response(etag):
+    """Return a 304 response if the request's If-None-Match matches etag, else None."""
+    if request.if_none_match and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        set_etag_headers(response, etag)
+        return response
+    return None
+
+def set_etag_headers(response, etag):
+    """Attach the weak ETag and force revalidation on every use."""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def touch_warranty(cur, warranty_id):
+    """Mark a warranty as changed for delta sync (e.g. after claim or tag changes)."""
+    cur.execute("UPDATE warranties SET updated_at = NOW() WHERE id = %s", (warranty_id,))
+
+def touch_warranties_with_tag(cur, tag_id):
+    """Mark every warranty carrying a tag as changed (tag renamed, recoloured or deleted)."""
+    cur.execute("""
+        UPDATE warranties SET updated_at = NOW()
+        WHERE id IN (SELECT warranty_id FROM warranty_tags WHERE tag_id = %s)
+    """, (tag_id,))
+
+def current_sync_point(cur):
+    """Return the timestamp the next delta sync may safely start from.
+
+    This is the start of the oldest transaction still open on the database (or
+    now), so writes that commit after this read are never skipped by a token.
+    """
+    cur.execute("""
+        SELECT LEAST(NOW(), MIN(xact_start))
+        FROM pg_stat_activity
+        WHERE datname = current_database() AND pid <> pg_backend_pid() AND xact_start IS NOT NULL
+    """)
+    return cur.fetchone()[0]
+
+def encode_sync_token(sync_point):
+    """Encode a sync point timestamp as an opaque token."""
+    return base64.urlsafe_b64encode(sync_point.isoformat().encode('utf-8')).decode('ascii')
+
+def decode_sync_token(token):
+    """Decode a token from encode_sync_token. Raises ValueError when malformed."""
+    try:
+        sync_point = datetime.fromisoformat(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError("Invalid sync token")
+    if sync_point.tzinfo is None:
+        raise ValueError("Invalid sync token")
+    return sync_point
+
+def purge_expired_deletions(get_db_connection, release_db_connection):
+    """Delete warranty tombstones older than the sync retention window."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM warranty_deletions WHERE deleted_at < NOW() - make_interval(days => %s)",
+                (SYNC_TOMBSTONE_RETENTION_DAYS,)
+            )
+            purged = cur.rowcount
+            conn.commit()
+        if purged:
+            logger.info(f"Purged {purged} expired warranty deletion tombstones")
+    except Exception as e:
+        logger.error(f"Error purging warranty deletion tombstones: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            release_db_connection(conn)
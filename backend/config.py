@@ -28,6 +28,10 @@ class Config:
     # Flask Core Configuration
     SECRET_KEY = get_try_create_secret()
     JWT_EXPIRATION_DELTA = timedelta(hours=int(os.environ.get('JWT_EXPIRATION_HOURS', '24')))
+    # Opt-in stateless tokens: short-lived access tokens carrying the user's claims plus a
+    # refresh token valid for JWT_EXPIRATION_DELTA (see auth_utils.issue_session_tokens)
+    STATELESS_JWT = os.environ.get('STATELESS_JWT', 'false').lower() == 'true'
+    STATELESS_JWT_ACCESS_DELTA = timedelta(minutes=int(os.environ.get('STATELESS_JWT_ACCESS_MINUTES', '15')))
     
     # Security Warning for Default Secret Key
     @staticmethod
@@ -80,6 +84,12 @@ class Config:
     # Request Handling Optimization
     MAX_COOKIE_SIZE = 4093  # Slightly under 4KB limit
     USE_X_SENDFILE = True  # Let nginx handle file serving
+    # nginx internal location that /secure-file downloads are redirected to (empty disables)
+    X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX', '/protected-uploads/')
+    # Seconds browsers may reuse an authorized upload without revalidating (0 = always revalidate)
+    DOCUMENT_CACHE_MAX_AGE = int(os.environ.get('DOCUMENT_CACHE_MAX_AGE', '86400'))
+    # Let PostgreSQL build warranty list JSON (json_agg) and pass it through undecoded
+    DB_JSON_LISTS = os.environ.get('DB_JSON_LISTS', 'false').lower() == 'true'
     
     @staticmethod
     def init_app(app):
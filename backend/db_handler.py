@@ -1,11 +1,22 @@
 # backend/db_handler.py
 import os
+import sys
+import threading
 import psycopg2
-from psycopg2 import pool
+import psycopg2.extensions
 import logging
 import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
+from flask import g, has_request_context, request
+
+try:
+    from .db_pool import BoundedConnectionPool, PoolTimeout
+    from .site_settings_cache import SiteSettingsCache, notify_site_settings_changed
+except ImportError:
+    from db_pool import BoundedConnectionPool, PoolTimeout
+    from site_settings_cache import SiteSettingsCache, notify_site_settings_changed
 
 logger = logging.getLogger(__name__)
 
@@ -16,10 +27,59 @@ DB_NAME = os.environ.get('DB_NAME', 'warranty_db')
 DB_USER = os.environ.get('DB_USER', 'warranty_user')
 DB_PASSWORD = os.environ.get('DB_PASSWORD', 'warranty_password')
 
+def _number_from_env(name, default, cast=int):
+    try:
+        return cast(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"{name} is not a valid number, using {default}")
+        return default
+
+# Connection pool sizing and limits (per worker process)
+DB_POOL_MIN_CONNECTIONS = _number_from_env('DB_POOL_MIN_CONNECTIONS', 1)
+DB_POOL_MAX_CONNECTIONS = _number_from_env('DB_POOL_MAX_CONNECTIONS', 4)
+DB_POOL_CHECKOUT_TIMEOUT = _number_from_env('DB_POOL_CHECKOUT_TIMEOUT', 10.0, float) # Seconds to wait for a free connection
+DB_POOL_MAX_LIFETIME = _number_from_env('DB_POOL_MAX_LIFETIME', 3600.0, float) # Seconds before a connection is recycled
+DB_POOL_VALIDATE_IDLE_AFTER = _number_from_env('DB_POOL_VALIDATE_IDLE_AFTER', 30.0, float) # Idle seconds before a connection is re-checked
+DB_POOL_MAX_WAITING = _number_from_env('DB_POOL_MAX_WAITING', 32) # Checkouts allowed to wait at once (-1 = unlimited)
+DB_CONN_HOLD_WARN_SECONDS = _number_from_env('DB_CONN_HOLD_WARN_SECONDS', 10.0, float) # Warn when a checkout is held longer
+
 connection_pool = None # Global connection pool for this module
 # Track the PID that created the current pool to detect post-fork reuse
 pool_pid: Optional[int] = None
 
+def _gevent_wait_callback(conn, timeout=None):
+    """psycopg2 wait callback that waits for socket readiness through the gevent hub."""
+    from gevent.socket import wait_read, wait_write
+    while True:
+        state = conn.poll()
+        if state == psycopg2.extensions.POLL_OK:
+            break
+        elif state == psycopg2.extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == psycopg2.extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Bad result from poll: {state!r}")
+
+def install_gevent_wait_callback() -> bool:
+    """Make psycopg2 yield to other greenlets while waiting on the database.
+
+    psycopg2's libpq calls are C code that gevent's monkey patching cannot
+    reach, so without a wait callback every query blocks the whole gevent
+    worker. This is a no-op unless gevent has patched the socket module
+    (gunicorn_config.py does so for gevent workers). Must run before any
+    connection is opened.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    if not monkey.is_module_patched('socket'):
+        return False
+    psycopg2.extensions.set_wait_callback(_gevent_wait_callback)
+    logger.info("[DB_HANDLER] Installed gevent wait callback for psycopg2")
+    return True
+
 def _close_stale_pool_if_forked(current_pid: int) -> None:
     """Close any existing pool if it was created in a different process.
 
@@ -56,9 +116,14 @@ def init_db_pool(max_retries=5, retry_delay=5):
     while attempt < max_retries:
         try:
             logger.info(f"[DB_HANDLER] Attempting to initialize database pool (attempt {attempt+1}/{max_retries})")
-            # Optimized connection pool for memory efficiency
-            connection_pool = pool.SimpleConnectionPool(
-                1, 4, # Reduced from 1,10 to 1,4 for memory efficiency
+            # Bounded pool (1-4 connections by default for memory efficiency); exhausted
+            # checkouts wait up to DB_POOL_CHECKOUT_TIMEOUT seconds instead of failing
+            connection_pool = BoundedConnectionPool(
+                DB_POOL_MIN_CONNECTIONS, DB_POOL_MAX_CONNECTIONS,
+                checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT,
+                max_lifetime=DB_POOL_MAX_LIFETIME,
+                validate_idle_after=DB_POOL_VALIDATE_IDLE_AFTER,
+                max_waiting=DB_POOL_MAX_WAITING if DB_POOL_MAX_WAITING >= 0 else None,
                 host=DB_HOST,
                 port=DB_PORT,
                 database=DB_NAME,
@@ -84,7 +149,7 @@ def init_db_pool(max_retries=5, retry_delay=5):
     else:
         raise Exception("Unknown error creating database pool")
 
-def get_db_connection():
+def _checkout_pool_connection():
     global connection_pool, pool_pid
     current_pid = os.getpid()
 
@@ -102,6 +167,10 @@ def get_db_connection():
             raise Exception("Database connection pool is not initialized and could not be re-initialized.")
     try:
         return connection_pool.getconn()
+    except PoolTimeout as e:
+        # The pool is healthy but busy; reinitializing would not help
+        logger.error(f"[DB_HANDLER] No pooled connection available: {e}")
+        raise
     except Exception as e:
         logger.error(f"[DB_HANDLER] Error getting connection from pool: {e}")
         # As a last resort, try reinitializing once in case the pool was invalidated
@@ -113,7 +182,7 @@ def get_db_connection():
             # Re-raise original to preserve context
             raise
 
-def release_db_connection(conn):
+def _return_pool_connection(conn):
     global connection_pool
     if connection_pool:
         try:
@@ -136,27 +205,260 @@ def release_db_connection(conn):
             except Exception as e:
                 logger.error(f"[DB_HANDLER] Error closing connection directly (pool was None): {e}")
 
+# Checkout accounting and leak detection
+#
+# Every connection handed out by get_db_connection() is recorded with its owner
+# (the route of the current request, or "job:<function>" outside a request) and
+# the call site that took it. Returning it records how long it was held and
+# warns when that exceeds DB_CONN_HOLD_WARN_SECONDS; connections a request
+# checked out but never returned (and did not hand to a streamed response) are
+# reported as leaks at request teardown, before the request connection itself
+# is released. Connections that never come back at all (a stuck job, a stream
+# that is never consumed) are caught by a sweep, run on checkout at most every
+# DB_CONN_HOLD_WARN_SECONDS and on stats(), that warns once per checkout held
+# past the threshold and counts it as stale.
+
+class _CheckoutRecord:
+    __slots__ = ('owner', 'site', 'started', 'detached', 'stale')
+
+    def __init__(self, owner, site):
+        self.owner = owner
+        self.site = site
+        self.started = time.monotonic()
+        self.detached = False
+        self.stale = False
+
+class _CheckoutTracker:
+    def __init__(self, warn_after):
+        self.warn_after = warn_after
+        self._lock = threading.Lock()
+        self._outstanding = {}
+        self._by_owner = {}
+        self._next_sweep = 0.0
+        self.leaks = 0
+        self.stale = 0
+
+    def checkout(self, conn, owner, site):
+        with self._lock:
+            self._outstanding[id(conn)] = _CheckoutRecord(owner, site)
+        if time.monotonic() >= self._next_sweep:
+            self.sweep()
+
+    def sweep(self):
+        """Warn about and count checkouts held past warn_after that have not come back yet, once each."""
+        with self._lock:
+            now = time.monotonic()
+            self._next_sweep = now + self.warn_after
+            stale = [record for record in self._outstanding.values()
+                     if not record.stale and now - record.started > self.warn_after]
+            for record in stale:
+                record.stale = True
+            self.stale += len(stale)
+        for record in stale:
+            logger.warning(f"[DB_HANDLER] Connection still checked out after {now - record.started:.2f}s "
+                           f"(threshold {self.warn_after:.0f}s) by {record.owner} at {record.site}"
+                           f"{' (handed to a streamed response)' if record.detached else ''}")
+
+    def checkin(self, conn):
+        with self._lock:
+            record = self._outstanding.pop(id(conn), None)
+            if record is None:
+                return
+            held = time.monotonic() - record.started
+            totals = self._by_owner.setdefault(record.owner, {'checkouts': 0, 'held_seconds_total': 0.0, 'held_seconds_max': 0.0, 'slow': 0})
+            totals['checkouts'] += 1
+            totals['held_seconds_total'] += held
+            totals['held_seconds_max'] = max(totals['held_seconds_max'], held)
+            if held > self.warn_after:
+                totals['slow'] += 1
+        if held > self.warn_after:
+            logger.warning(f"[DB_HANDLER] Connection held for {held:.2f}s (threshold {self.warn_after:.0f}s) by {record.owner} at {record.site}")
+
+    def get(self, conn):
+        with self._lock:
+            return self._outstanding.get(id(conn))
+
+    def report_leaks(self, conn_ids):
+        """Log and count connections among conn_ids that are still checked out and not handed off."""
+        with self._lock:
+            leaked = [self._outstanding[conn_id] for conn_id in conn_ids
+                      if conn_id in self._outstanding and not self._outstanding[conn_id].detached]
+            self.leaks += len(leaked)
+        for record in leaked:
+            logger.warning(f"[DB_HANDLER] Connection leak: checked out by {record.owner} at {record.site} "
+                           f"{time.monotonic() - record.started:.2f}s ago and not released by the end of the request")
+
+    def stats(self):
+        self.sweep()
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'hold_warn_seconds': self.warn_after,
+                'leaks': self.leaks,
+                'stale': self.stale,
+                'outstanding': [
+                    {'owner': record.owner, 'site': record.site, 'held_seconds': round(now - record.started, 3),
+                     'detached': record.detached, 'stale': record.stale}
+                    for record in self._outstanding.values()
+                ],
+                'by_owner': {
+                    owner: dict(totals, held_seconds_total=round(totals['held_seconds_total'], 3), held_seconds_max=round(totals['held_seconds_max'], 3))
+                    for owner, totals in self._by_owner.items()
+                }
+            }
+
+checkout_tracker = _CheckoutTracker(DB_CONN_HOLD_WARN_SECONDS)
+
+def _checkout_owner(caller):
+    """Describe who is taking a connection: the request's route, or the calling job function."""
+    site = f"{os.path.basename(caller.f_code.co_filename)}:{caller.f_code.co_name}:{caller.f_lineno}"
+    if has_request_context():
+        rule = request.url_rule.rule if request.url_rule else request.path
+        return f"{request.method} {rule}", site
+    return f"job:{caller.f_code.co_name}", site
+
+def get_pool_stats() -> Optional[Dict]:
+    """Return this worker's connection pool metrics, or None if the pool is not initialized"""
+    if connection_pool is None or pool_pid != os.getpid():
+        return None
+    stats = connection_pool.stats()
+    stats['checkouts_by_owner'] = checkout_tracker.stats()
+    return stats
+
+# Request-scoped connection
+#
+# Inside a request, get_db_connection() hands out one lazily acquired pool
+# connection stored on flask.g, so token_required and the view share it instead
+# of holding two of the pool's slots. release_db_connection() leaves that
+# connection alone; release_request_connection() (registered as a
+# teardown_request handler) returns it to the pool. Outside a request context
+# (scheduler jobs, startup code), or with request_scoped=False, every call checks
+# out its own connection.
+
+def _tracked_checkout(caller):
+    conn = _checkout_pool_connection()
+    owner, site = _checkout_owner(caller)
+    checkout_tracker.checkout(conn, owner, site)
+    if has_request_context():
+        g.setdefault('_db_checkouts', []).append(id(conn))
+    return conn
+
+def _tracked_release(conn):
+    checkout_tracker.checkin(conn)
+    _return_pool_connection(conn)
+
+def get_db_connection(request_scoped=True):
+    caller = sys._getframe(1)
+    if not request_scoped or not has_request_context():
+        return _tracked_checkout(caller)
+    conn = g.get('_db_conn')
+    if conn is None or conn.closed:
+        if conn is not None:
+            _tracked_release(conn) # Free the broken connection's pool slot
+        conn = _tracked_checkout(caller)
+        g._db_conn = conn
+    return conn
+
+def release_db_connection(conn):
+    if has_request_context() and conn is not None and g.get('_db_conn') is conn:
+        return # Released by release_request_connection() at teardown
+    _tracked_release(conn)
+
+def detach_request_connection(conn):
+    """Take conn out of request scope so teardown does not release it.
+
+    Used by streamed responses, whose body is produced after teardown_request
+    has run; the caller becomes responsible for calling release_db_connection().
+    """
+    if has_request_context() and g.get('_db_conn') is conn:
+        g._db_conn = None
+    record = checkout_tracker.get(conn)
+    if record is not None:
+        record.detached = True
+
+def release_request_connection(exc=None):
+    """teardown_request handler: report leaks, roll back anything left open and return the request connection to the pool."""
+    conn = g.pop('_db_conn', None)
+    # Checked while the view's other checkouts are still outstanding; the request
+    # connection itself is released below and is not a leak
+    checkout_tracker.report_leaks([conn_id for conn_id in g.pop('_db_checkouts', ()) if conn is None or conn_id != id(conn)])
+    if conn is not None:
+        if not conn.closed:
+            try:
+                conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception as e:
+                logger.warning(f"[DB_HANDLER] Error resetting request connection before release: {e}")
+        _tracked_release(conn)
+
+@contextmanager
+def _site_settings_connection():
+    """Read settings on the request's connection when one is held, else on a dedicated pool connection."""
+    conn = g.get('_db_conn') if has_request_context() else None
+    if conn is not None and not conn.closed:
+        # Borrowed: do not take a second pool slot, and leave an open view transaction alone
+        was_idle = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        try:
+            yield conn
+        finally:
+            if was_idle and not conn.autocommit:
+                conn.rollback()
+        return
+    conn = get_db_connection(request_scoped=False)
+    try:
+        yield conn
+        conn.rollback()
+    finally:
+        release_db_connection(conn)
+
+# Site settings are served from a per-process cache that every worker drops when
+# update_site_setting()/admin settings updates send a NOTIFY (see site_settings_cache)
+site_settings_cache = SiteSettingsCache(
+    _site_settings_connection,
+    dict(
+        host=DB_HOST,
+        port=DB_PORT,
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        connect_timeout=10,
+        application_name='warracker_settings_listener'
+    )
+)
+
+def get_site_settings() -> Dict[str, str]:
+    """Get all site settings as a dict (cached).
+
+    Raises if the settings cannot be loaded, so authorization checks (global
+    view) fail closed instead of falling back to permissive defaults.
+    """
+    return site_settings_cache.get_all()
+
 def get_site_setting(setting_name: str, default_value: str = '') -> str:
-    """Get a site setting value from the database"""
+    """Get a site setting value, or default_value if it is unset or cannot be loaded"""
+    try:
+        value = get_site_settings().get(setting_name)
+    except Exception as e:
+        logger.error(f"Error getting site setting {setting_name}: {e}")
+        return default_value
+    return value if value is not None else default_value
+
+def refresh_global_statistics() -> bool:
+    """Refresh the global_warranty_expiration_stats materialized view without blocking readers"""
     conn = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT value FROM site_settings WHERE key = %s",
-            (setting_name,)
-        )
-        result = cursor.fetchone()
+        cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY global_warranty_expiration_stats")
+        conn.commit()
         cursor.close()
-        
-        if result:
-            return result[0] if result[0] is not None else default_value
-        return default_value
-        
+        return True
     except Exception as e:
-        logger.error(f"Error getting site setting {setting_name}: {e}")
-        return default_value
+        logger.error(f"Error refreshing global warranty statistics: {e}")
+        if conn:
+            conn.rollback()
+        return False
     finally:
         if conn:
             release_db_connection(conn)
@@ -278,9 +580,11 @@ def update_site_setting(setting_name: str, setting_value: str) -> bool:
             ON CONFLICT (key) 
             DO UPDATE SET value = EXCLUDED.value, updated_at = CURRENT_TIMESTAMP
         """, (setting_name, setting_value))
+        notify_site_settings_changed(cursor)
         
         conn.commit()
         cursor.close()
+        site_settings_cache.invalidate()
         return True
         
     except Exception as e:
@@ -0,0 +1,244 @@
+# backend/db_pool.py
+"""
+Bounded PostgreSQL connection pool used by db_handler.
+
+Unlike psycopg2's SimpleConnectionPool, checkouts that find the pool exhausted
+wait (up to checkout_timeout seconds) for a connection to be returned instead
+of failing immediately. The pool only uses threading primitives, which gevent's
+monkey patching (applied in gunicorn_config.py) turns into greenlet-aware ones,
+so it is safe under both sync/threaded and gevent workers.
+
+- Idle connections that have not been used for validate_idle_after seconds are
+  checked with a cheap query before being handed out.
+- Connections older than max_lifetime seconds are closed instead of reused.
+- At most max_waiting checkouts wait at once; further ones fail immediately
+  with PoolTimeout so an overloaded worker sheds requests instead of queueing
+  them all until the timeout.
+- stats() reports in-use/idle gauges, a checkout wait-time histogram and the
+  number of checkouts that timed out or were rejected.
+"""
+import os
+import threading
+import time
+import logging
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions, pool
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the checkout wait-time histogram buckets
+WAIT_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+class PoolTimeout(pool.PoolError):
+    """Raised when no connection became available within the checkout timeout."""
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'returned_at')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.returned_at = self.created_at
+
+class BoundedConnectionPool:
+    """Thread-safe pool of at most maxconn connections with a bounded wait for checkouts."""
+
+    def __init__(self, minconn, maxconn, checkout_timeout=10.0, max_lifetime=3600.0,
+                 validate_idle_after=30.0, max_waiting=None, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(f"Invalid pool size: minconn={minconn}, maxconn={maxconn}")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.max_lifetime = max_lifetime
+        self.validate_idle_after = validate_idle_after
+        self.max_waiting = max_waiting
+        self._connect_kwargs = connect_kwargs
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._in_use = {}
+        self._opening = 0
+        self._waiting = 0
+        self.closed = False
+        # Metrics
+        self.checkouts = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.discarded = 0
+        self._wait_counts = [0] * (len(WAIT_TIME_BUCKETS) + 1)
+        self._wait_sum = 0.0
+
+        for _ in range(minconn):
+            self._idle.append(_PooledConnection(self._connect()))
+
+    def _connect(self):
+        return psycopg2.connect(**self._connect_kwargs)
+
+    def _size(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _expired(self, entry, now):
+        return self.max_lifetime and now - entry.created_at > self.max_lifetime
+
+    def _discard(self, conn):
+        self.discarded += 1
+        if not conn.closed:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"[DB_POOL] Error closing discarded connection: {e}")
+
+    def _is_usable(self, entry, now):
+        """Return True if an idle connection can be handed out, validating it if it has been idle a while."""
+        conn = entry.conn
+        if conn.closed or self._expired(entry, now):
+            return False
+        if now - entry.returned_at < self.validate_idle_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"[DB_POOL] Idle connection failed validation, discarding it: {e}")
+            return False
+
+    def _record_wait(self, waited):
+        self._wait_sum += waited
+        for index, bound in enumerate(WAIT_TIME_BUCKETS):
+            if waited <= bound:
+                self._wait_counts[index] += 1
+                return
+        self._wait_counts[-1] += 1
+
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting up to timeout (default checkout_timeout) seconds for one to free up."""
+        if timeout is None:
+            timeout = self.checkout_timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self.closed:
+                        raise pool.PoolError("connection pool is closed")
+                    if self._idle:
+                        # Most recently returned first, so surplus connections age out
+                        entry = self._idle.pop()
+                        self._in_use[id(entry.conn)] = entry
+                        break
+                    if self._size() < self.maxconn:
+                        self._opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(f"no connection available within {timeout:.1f}s "
+                                          f"({len(self._in_use)} in use, {self._waiting} waiting)")
+                    if self.max_waiting is not None and self._waiting >= self.max_waiting:
+                        self.rejected += 1
+                        raise PoolTimeout(f"no connection available and wait queue full "
+                                          f"({len(self._in_use)} in use, {self._waiting} waiting)")
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+            # Connecting and validating happen outside the lock
+            if entry is None:
+                try:
+                    entry = _PooledConnection(self._connect())
+                except Exception:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opening -= 1
+                    self._in_use[id(entry.conn)] = entry
+            elif not self._is_usable(entry, time.monotonic()):
+                with self._cond:
+                    self._in_use.pop(id(entry.conn), None)
+                    self._discard(entry.conn)
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self.checkouts += 1
+                self._record_wait(time.monotonic() - started)
+            return entry.conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection to the pool, resetting any open transaction first."""
+        with self._cond:
+            entry = self._in_use.get(id(conn))
+        if entry is None or entry.conn is not conn:
+            raise pool.PoolError("trying to put unkeyed connection")
+
+        if not close and not conn.closed:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception as e:
+                    logger.warning(f"[DB_POOL] Rollback on return failed, discarding connection: {e}")
+                    close = True
+
+        with self._cond:
+            del self._in_use[id(conn)]
+            now = time.monotonic()
+            if close or conn.closed or self.closed or self._expired(entry, now):
+                self._discard(conn)
+            else:
+                entry.returned_at = now
+                self._idle.append(entry)
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every connection (idle and checked out) and refuse further checkouts."""
+        with self._cond:
+            self.closed = True
+            entries = list(self._idle) + list(self._in_use.values())
+            self._idle.clear()
+            self._in_use.clear()
+            self._cond.notify_all()
+        for entry in entries:
+            if not entry.conn.closed:
+                try:
+                    entry.conn.close()
+                except Exception:
+                    pass
+
+    def stats(self):
+        with self._cond:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(WAIT_TIME_BUCKETS, self._wait_counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets['+Inf'] = cumulative + self._wait_counts[-1]
+            return {
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'opening': self._opening,
+                'waiting': self._waiting,
+                'max_waiting': self.max_waiting,
+                'min_connections': self.minconn,
+                'max_connections': self.maxconn,
+                'checkout_timeout_seconds': self.checkout_timeout,
+                'max_lifetime_seconds': self.max_lifetime,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'rejected': self.rejected,
+                'discarded': self.discarded,
+                'wait_seconds_buckets': buckets,
+                'wait_seconds_sum': round(self._wait_sum, 6),
+                'pid': os.getpid()
+            }
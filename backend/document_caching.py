@@ -0,0 +1,75 @@
+# backend/document_caching.py
+"""
+Validators and cache policy for document and photo downloads.
+
+Uploaded files are stored under timestamped names and never rewritten, so
+they are sent with "Cache-Control: private, max-age=DOCUMENT_CACHE_MAX_AGE"
+and a strong ETag/Last-Modified pair derived from the file's mtime and size.
+The ETag has the same format nginx uses, so validators match whether the
+file was sent by the app or through X-Accel-Redirect. Conditional requests
+are answered with 304 only after the route has authorized the user.
+"""
+from datetime import datetime, timezone
+
+from flask import Response, current_app, request
+from werkzeug.http import http_date, parse_date
+
+def document_cache_control():
+    """Cache-Control for authorized uploads: private, cached for the configured max-age."""
+    max_age = current_app.config.get('DOCUMENT_CACHE_MAX_AGE', 0)
+    if max_age > 0:
+        return f"private, max-age={max_age}"
+    return 'private, no-cache'
+
+def file_validators(stat_result):
+    """Return (etag, last_modified) for a file, etag unquoted, last_modified in whole seconds."""
+    last_modified = int(stat_result.st_mtime)
+    return f"{last_modified:x}-{stat_result.st_size:x}", last_modified
+
+def validator_headers(etag, last_modified):
+    """Response headers carrying the validators of a representation."""
+    headers = {}
+    if etag:
+        headers['ETag'] = f'"{etag}"'
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+def _timestamp(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+def is_not_modified(etag, last_modified):
+    """Evaluate If-None-Match (or, without it, If-Modified-Since) against the validators."""
+    if request.if_none_match:
+        return bool(etag) and request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= _timestamp(request.if_modified_since)
+    return False
+
+def not_modified_response(etag, last_modified, cache_control):
+    """Return a 304 response if the request's conditional headers match, else None."""
+    if not is_not_modified(etag, last_modified):
+        return None
+    response = Response(status=304)
+    for name, value in validator_headers(etag, last_modified).items():
+        response.headers[name] = value
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def if_range_matches(etag, last_modified):
+    """True if a Range request may be served partially (no If-Range, or If-Range still matches)."""
+    if_range = request.if_range
+    if if_range.etag:
+        return bool(etag) and if_range.etag == etag
+    if if_range.date:
+        return last_modified is not None and _timestamp(if_range.date) == last_modified
+    return 'If-Range' not in request.headers
+
+def http_date_to_timestamp(value):
+    """Parse an HTTP date header value into whole seconds, or None."""
+    if not value:
+        return None
+    parsed = parse_date(value)
+    return _timestamp(parsed) if isinstance(parsed, datetime) else None
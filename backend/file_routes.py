@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify, current_app, send_from_directory,
 import os
 import mimetypes
 import logging
+from urllib.parse import quote
 
 # Use try-except pattern for imports to handle both Docker and development environments
 try:
@@ -10,13 +11,19 @@ try:
     from .auth_utils import token_required, admin_required
     from .paperless_handler import get_paperless_handler
     from .utils import allowed_file
-    from .db_handler import get_db_connection, release_db_connection
+    from .db_handler import get_db_connection, release_db_connection, get_site_settings
+    from .change_tracking import bump_user_data_version, bump_warranty_owner_data_version
+    from .byte_ranges import FILE_STREAM_CHUNK_SIZE, file_response, resolve_byte_ranges, content_range, slice_chunks, range_not_satisfiable_response
+    from .document_caching import document_cache_control, file_validators, validator_headers, not_modified_response, if_range_matches, http_date_to_timestamp
 except ImportError:
     import db_handler
     from auth_utils import token_required, admin_required
     from paperless_handler import get_paperless_handler
     from utils import allowed_file
-    from db_handler import get_db_connection, release_db_connection
+    from db_handler import get_db_connection, release_db_connection, get_site_settings
+    from change_tracking import bump_user_data_version, bump_warranty_owner_data_version
+    from byte_ranges import FILE_STREAM_CHUNK_SIZE, file_response, resolve_byte_ranges, content_range, slice_chunks, range_not_satisfiable_response
+    from document_caching import document_cache_control, file_validators, validator_headers, not_modified_response, if_range_matches, http_date_to_timestamp
 
 # Create the file routes blueprint
 file_bp = Blueprint('file_bp', __name__)
@@ -24,6 +31,57 @@ file_bp = Blueprint('file_bp', __name__)
 # Set up logging
 logger = logging.getLogger(__name__)
 
+def _x_accel_redirect_location(filename):
+    """
+    Return the nginx internal location serving an upload, or None to stream it from the app.
+
+    nginx marks proxied requests with "X-Sendfile-Type: X-Accel-Redirect" (see
+    nginx.conf), so direct requests to gunicorn keep the streaming fallback.
+    """
+    prefix = current_app.config.get('X_ACCEL_REDIRECT_PREFIX')
+    if not prefix or request.headers.get('X-Sendfile-Type') != 'X-Accel-Redirect':
+        return None
+    return prefix.rstrip('/') + '/' + quote(filename)
+
+def _relay_upstream(upstream, chunks):
+    """Yield chunks of an upstream (requests) response, closing it when the client is done."""
+    try:
+        yield from chunks
+    finally:
+        upstream.close()
+
+def _upstream_if_range_matches(upstream):
+    """Evaluate the request's If-Range against the validators of an upstream response."""
+    etag = upstream.headers.get('ETag', '')
+    # Weak ETags never satisfy If-Range
+    etag = etag.strip('"') if etag.startswith('"') else None
+    return if_range_matches(etag, http_date_to_timestamp(upstream.headers.get('Last-Modified')))
+
+# Document kinds other users may open through the global view
+GLOBAL_VIEW_DOCUMENT_KINDS = ('invoice', 'manual', 'photo')
+
+def _lookup_document_owners(cur, storage_key):
+    """Return (warranty_id, user_id, kind) rows for a document ('uploads/<file>' or 'paperless:<id>')."""
+    cur.execute(
+        "SELECT warranty_id, user_id, kind FROM warranty_documents WHERE storage_key = %s",
+        (storage_key,)
+    )
+    return cur.fetchall()
+
+def _is_document_authorized(owners, user_id, is_admin):
+    """Admins and owners may open a document; others only shared kinds, when global view allows it."""
+    if is_admin or any(owner_id == user_id for _, owner_id, _ in owners):
+        return True
+    if not any(kind in GLOBAL_VIEW_DOCUMENT_KINDS for _, _, kind in owners):
+        return False
+    settings = get_site_settings()
+    global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
+    admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
+    if global_view_enabled and not admin_only:
+        logger.info(f"Global view access granted to user {user_id} for shared document")
+        return True
+    return False
+
 # ============================
 # Local File Serving Routes
 # ============================
@@ -74,49 +132,13 @@ def secure_file_access(filename):
         conn = get_db_connection()
         with conn.cursor() as cur:
             db_search_path = f"uploads/{filename}"
-            logger.info(f"[SECURE_FILE] Searching DB for paths like: '{db_search_path}' (repr: {repr(db_search_path)})")
-            query = """
-                SELECT w.id, w.user_id
-                FROM warranties w
-                WHERE w.invoice_path = %s OR w.manual_path = %s OR w.other_document_path = %s OR w.product_photo_path = %s
-            """
-            cur.execute(query, (db_search_path, db_search_path, db_search_path, db_search_path))
-            results = cur.fetchall()
-            logger.info(f"[SECURE_FILE] DB query results for '{db_search_path}': {results}")
+            results = _lookup_document_owners(cur, db_search_path)
+            logger.info(f"[SECURE_FILE] Document owners for '{db_search_path}': {results}")
 
             user_id = request.user['id']
             is_admin = request.user.get('is_admin', False)
-            authorized = is_admin
-            logger.info(f"[SECURE_FILE] Initial authorization (is_admin={is_admin}): {authorized}")
-
-            # Check for ownership authorization
-            if not authorized and results:
-                for warranty_id_db, warranty_user_id_db in results:
-                    logger.info(f"[SECURE_FILE] Checking ownership: warranty_id={warranty_id_db}, owner_id={warranty_user_id_db}, current_user_id={user_id}")
-                    if warranty_user_id_db == user_id:
-                        authorized = True
-                        logger.info(f"[SECURE_FILE] Ownership confirmed for warranty_id={warranty_id_db}")
-                        break
-            
-            # Check global view permissions for shared documents (photos, invoices, manuals)
-            if not authorized and results:
-                for warranty_id_db, warranty_user_id_db in results:
-                    # Check if the requested file is a product photo, invoice, or manual for the given warranty
-                    cur.execute('SELECT product_photo_path, invoice_path, manual_path FROM warranties WHERE id = %s', (warranty_id_db,))
-                    warranty_files = cur.fetchone()
-                    # Check if the file path is one of the globally viewable document types
-                    if warranty_files and db_search_path in warranty_files:
-                        # This is a shared document type - check global view settings
-                        cur.execute("SELECT key, value FROM site_settings WHERE key IN ('global_view_enabled', 'global_view_admin_only')")
-                        settings = {row[0]: row[1] for row in cur.fetchall()}
-                        
-                        global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
-                        admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
-                        
-                        if global_view_enabled and (not admin_only or is_admin):
-                            authorized = True
-                            logger.info(f"[SECURE_FILE] Global view access granted for shared document: {filename}")
-                            break
+            authorized = _is_document_authorized(results, user_id, is_admin)
+            logger.info(f"[SECURE_FILE] Authorization for user {user_id} (is_admin={is_admin}): {authorized}")
             
             if not authorized:
                 logger.warning(f"[SECURE_FILE] Unauthorized file access attempt: '{filename}' (repr: {repr(filename)}) by user {user_id}. DB results count: {len(results) if results else 'None'}")
@@ -146,63 +168,50 @@ def secure_file_access(filename):
             
             # Check file size and readability
             try:
-                file_size = os.path.getsize(target_file_path_for_send)
+                file_stat = os.stat(target_file_path_for_send)
+                file_size = file_stat.st_size
                 logger.info(f"[SECURE_FILE] File size: {file_size} bytes")
-                
-                # Verify we can read the file
-                with open(target_file_path_for_send, 'rb') as f:
-                    # Try to read first byte to ensure file is readable
-                    f.read(1)
-                    f.seek(0)  # Reset file pointer
-                    
-            except (OSError, IOError) as e:
+            except OSError as e:
                 logger.error(f"[SECURE_FILE] Cannot read file '{target_file_path_for_send}': {e}")
                 return jsonify({"message": "File read error"}), 500
             
-            # Use Flask's send_from_directory with enhanced error handling
+            if not os.access(target_file_path_for_send, os.R_OK):
+                logger.error(f"[SECURE_FILE] File '{target_file_path_for_send}' is not readable")
+                return jsonify({"message": "File read error"}), 500
+            
+            # Uploads are never rewritten in place, so the browser may reuse its copy
+            etag, last_modified = file_validators(file_stat)
+            cache_control = document_cache_control()
+            not_modified = not_modified_response(etag, last_modified, cache_control)
+            if not_modified:
+                logger.info(f"[SECURE_FILE] Not modified: '{filename}'")
+                return not_modified
+            
             try:
                 # Get MIME type
                 mimetype, _ = mimetypes.guess_type(target_file_path_for_send)
                 if not mimetype:
                     mimetype = 'application/octet-stream'
                 
-                logger.info(f"[SECURE_FILE] Serving file with size {file_size} bytes, mimetype: {mimetype}")
-                
-                # Use streaming for ALL files to prevent Content-Length mismatches
-                logger.info(f"[SECURE_FILE] Using streaming response for file: {filename}")
+                headers = {
+                    'Content-Disposition': f'inline; filename="{os.path.basename(filename)}"',
+                    'Accept-Ranges': 'bytes',
+                    'Cache-Control': cache_control,
+                    'X-Content-Type-Options': 'nosniff'
+                }
+                headers.update(validator_headers(etag, last_modified))
                 
-                def generate():
-                    try:
-                        with open(target_file_path_for_send, 'rb') as f:
-                            chunk_size = 4096  # 4KB chunks
-                            total_sent = 0
-                            while True:
-                                chunk = f.read(chunk_size)
-                                if not chunk:
-                                    break
-                                total_sent += len(chunk)
-                                logger.debug(f"[SECURE_FILE] Streaming chunk: {len(chunk)} bytes, total sent: {total_sent}/{file_size}")
-                                yield chunk
-                            logger.info(f"[SECURE_FILE] Streaming completed: {total_sent}/{file_size} bytes sent")
-                    except Exception as e:
-                        logger.error(f"[SECURE_FILE] Error during streaming: {e}")
-                        raise
+                # Behind nginx, hand the transfer to it so the worker is freed immediately
+                accel_location = _x_accel_redirect_location(filename)
+                if accel_location:
+                    logger.info(f"[SECURE_FILE] Delegating '{filename}' ({file_size} bytes, {mimetype}) to nginx")
+                    headers['X-Accel-Redirect'] = accel_location
+                    return Response(mimetype=mimetype, headers=headers)
                 
-                response = Response(
-                    generate(),
-                    mimetype=mimetype,
-                    headers={
-                        'Content-Length': str(file_size),
-                        'Content-Disposition': f'inline; filename="{os.path.basename(filename)}"',
-                        'Accept-Ranges': 'bytes',
-                        'Cache-Control': 'no-cache, no-store, must-revalidate',
-                        'Pragma': 'no-cache',
-                        'Expires': '0',
-                        'X-Content-Type-Options': 'nosniff',
-                        'Connection': 'close'
-                    }
-                )
-                return response
+                range_header = request.headers.get('Range') if if_range_matches(etag, last_modified) else None
+                logger.info(f"[SECURE_FILE] Streaming file '{filename}' ({file_size} bytes, {mimetype}, range: {range_header})")
+                headers['Connection'] = 'close'
+                return file_response(target_file_path_for_send, file_size, mimetype, headers, range_header)
             except Exception as send_error:
                 logger.error(f"[SECURE_FILE] Error serving file: {send_error}")
                 return jsonify({"message": "Error serving file"}), 500
@@ -226,49 +235,15 @@ def serve_paperless_document(paperless_id: int):
         # Get database connection
         conn = get_db_connection()
         
-        # Find warranty that has this Paperless document ID
+        # Find warranties that reference this Paperless document ID
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT w.id, w.user_id
-                FROM warranties w
-                WHERE w.paperless_invoice_id = %s OR w.paperless_manual_id = %s 
-                   OR w.paperless_photo_id = %s OR w.paperless_other_id = %s
-            """, (paperless_id, paperless_id, paperless_id, paperless_id))
-            
-            results = cur.fetchall()
+            results = _lookup_document_owners(cur, f"paperless:{paperless_id}")
             
             if not results:
                 logger.warning(f"[PAPERLESS_FILE] No warranty found with Paperless document ID {paperless_id}")
                 return jsonify({"message": "Document not found"}), 404
             
-            # Check authorization
-            authorized = is_admin
-            if not authorized:
-                for warranty_id_db, warranty_user_id_db in results:
-                    if warranty_user_id_db == user_id:
-                        authorized = True
-                        break
-            
-            # Check global view for shared documents (photos, invoices, manuals)
-            if not authorized:
-                cur.execute("""
-                    SELECT w.id, w.user_id
-                    FROM warranties w
-                    WHERE w.paperless_photo_id = %s OR w.paperless_invoice_id = %s OR w.paperless_manual_id = %s
-                """, (paperless_id, paperless_id, paperless_id))
-                shared_doc_results = cur.fetchall()
-                
-                if shared_doc_results:
-                    # Get global view settings
-                    cur.execute("SELECT key, value FROM site_settings WHERE key IN ('global_view_enabled', 'global_view_admin_only')")
-                    settings = {row[0]: row[1] for row in cur.fetchall()}
-                    
-                    global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
-                    admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
-                    
-                    if global_view_enabled and (not admin_only or is_admin):
-                        authorized = True
-                        logger.info(f"[PAPERLESS_FILE] Global view access granted for shared Paperless document: {paperless_id}")
+            authorized = _is_document_authorized(results, user_id, is_admin)
             
             if not authorized:
                 logger.warning(f"[PAPERLESS_FILE] Unauthorized access to Paperless document {paperless_id} by user {user_id}")
@@ -279,41 +254,78 @@ def serve_paperless_document(paperless_id: int):
         if not paperless_handler:
             return jsonify({"message": "Paperless-ngx integration not available"}), 503
         
-        # Get document from Paperless-ngx
-        success, content, message, content_type = paperless_handler.get_document_preview(paperless_id)
+        # Stream the document from Paperless-ngx, forwarding the client's Range and conditional headers
+        range_header = request.headers.get('Range')
+        conditional_headers = {
+            name: request.headers[name]
+            for name in ('If-None-Match', 'If-Modified-Since', 'If-Range')
+            if name in request.headers
+        }
+        success, upstream, message = paperless_handler.open_document_stream(paperless_id, range_header, conditional_headers)
         
         if not success:
             logger.error(f"[PAPERLESS_FILE] Failed to retrieve document {paperless_id}: {message}")
             return jsonify({"message": message}), 404
         
-        # Stream the document content
-        def generate():
-            chunk_size = 4096
-            total_sent = 0
-            remaining = len(content)
-            
-            while remaining > 0:
-                chunk_size_actual = min(chunk_size, remaining)
-                chunk = content[total_sent:total_sent + chunk_size_actual]
-                total_sent += chunk_size_actual
-                remaining -= chunk_size_actual
-                yield chunk
-        
-        # Return streaming response
+        # Paperless documents can be edited there, so always revalidate against its validators
+        headers = {
+            'Accept-Ranges': 'bytes',
+            'Content-Disposition': f'inline; filename="paperless_document_{paperless_id}"',
+            'Cache-Control': 'private, no-cache',
+            'X-Content-Type-Options': 'nosniff'
+        }
+        for name in ('ETag', 'Last-Modified'):
+            if upstream.headers.get(name):
+                headers[name] = upstream.headers[name]
+        content_type = upstream.headers.get('Content-Type') or 'application/octet-stream'
+        content_length = upstream.headers.get('Content-Length')
+        
+        if upstream.status_code == 304:
+            upstream.close()
+            logger.info(f"[PAPERLESS_FILE] Not modified: Paperless document {paperless_id}")
+            headers.pop('Accept-Ranges')
+            headers.pop('Content-Disposition')
+            return Response(status=304, headers=headers)
+        
+        if upstream.status_code == 416:
+            upstream.close()
+            response = jsonify({"message": "Requested range not satisfiable"})
+            response.status_code = 416
+            if upstream.headers.get('Content-Range'):
+                response.headers['Content-Range'] = upstream.headers['Content-Range']
+            return response
+        
+        status = 200
+        chunks = upstream.iter_content(chunk_size=FILE_STREAM_CHUNK_SIZE)
+        if upstream.status_code == 206:
+            # Paperless-ngx honoured the range (single part or multipart/byteranges)
+            status = 206
+            if upstream.headers.get('Content-Range'):
+                headers['Content-Range'] = upstream.headers['Content-Range']
+        elif range_header and content_length and content_length.isdigit() and _upstream_if_range_matches(upstream):
+            # Range ignored upstream: serve a single range by slicing the stream here
+            size = int(content_length)
+            ranges = resolve_byte_ranges(range_header, size)
+            if ranges == []:
+                upstream.close()
+                return range_not_satisfiable_response(size)
+            if ranges and len(ranges) == 1:
+                start, stop = ranges[0]
+                status = 206
+                chunks = slice_chunks(chunks, start, stop)
+                headers['Content-Range'] = content_range(start, stop, size)
+                content_length = str(stop - start)
+        if content_length:
+            headers['Content-Length'] = content_length
+        
         response = Response(
-            generate(),
-            mimetype=content_type or 'application/octet-stream',
-            headers={
-                'Content-Length': str(len(content)),
-                'Content-Disposition': f'inline; filename="paperless_document_{paperless_id}"',
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0',
-                'X-Content-Type-Options': 'nosniff'
-            }
+            _relay_upstream(upstream, chunks),
+            status=status,
+            content_type=content_type,
+            headers=headers
         )
         
-        logger.info(f"[PAPERLESS_FILE] Successfully served Paperless document {paperless_id} to user {user_id}")
+        logger.info(f"[PAPERLESS_FILE] Serving Paperless document {paperless_id} to user {user_id} (HTTP {status})")
         return response
         
     except Exception as e:
@@ -805,6 +817,7 @@ def cleanup_invalid_paperless_documents():
                                     SET {field_name} = NULL 
                                     WHERE id = %s
                                 """, (warranty_id,))
+                                bump_warranty_owner_data_version(cur, warranty_id)
                                 
                                 cleanup_results['cleaned_up'] += 1
                                 logger.info(f"Cleaned up invalid {field_name} reference for warranty {warranty_id}")
@@ -900,6 +913,8 @@ def paperless_search_and_link():
                 conn.rollback()
                 return jsonify({"success": False, "message": "Warranty not found or access denied"}), 404
 
+            bump_user_data_version(cursor, request.user["id"])
+
         conn.commit()
 
         logger.info("Successfully linked document %s to warranty %s", document_id, warranty_id)
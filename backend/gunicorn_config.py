@@ -97,6 +97,13 @@ def post_fork(server, worker):
     os.environ["GUNICORN_WORKER_CLASS"] = worker_class
     
     print(f"Worker {worker.pid} (ID: {worker.age - 1}) forked with memory optimization")
+    
+    # Site settings LISTEN connection: workers only, never the preloaded master
+    try:
+        from backend.db_handler import site_settings_cache
+        site_settings_cache.enable_listener()
+    except Exception as e:
+        print(f"⚠️ Site settings listener not enabled for worker {worker.pid}: {e}")
 
 def pre_fork(server, worker):
     """Called just before a worker is forked."""
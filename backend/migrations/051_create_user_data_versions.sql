@@ -0,0 +1,7 @@
+-- Migration: Create user_data_versions table
+-- Description: Per-user monotonic change counter used to build ETags for warranty, tag and statistics reads.
+CREATE TABLE IF NOT EXISTS user_data_versions (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,27 @@
+-- Migration: Create warranty_deletions log
+-- Description: Records deleted warranties so GET /warranties/changes can return tombstones for delta sync.
+CREATE TABLE IF NOT EXISTS warranty_deletions (
+    id SERIAL PRIMARY KEY,
+    warranty_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_warranty_deletions_user_deleted_at ON warranty_deletions(user_id, deleted_at);
+CREATE INDEX IF NOT EXISTS idx_warranties_user_updated_at ON warranties(user_id, updated_at);
+
+-- Log every warranty deletion, whichever code path (or cascade) removed the row
+CREATE OR REPLACE FUNCTION log_warranty_deletion()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO warranty_deletions (warranty_id, user_id) VALUES (OLD.id, OLD.user_id);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS warranties_log_deletion ON warranties;
+
+CREATE TRIGGER warranties_log_deletion
+    AFTER DELETE ON warranties
+    FOR EACH ROW
+    EXECUTE FUNCTION log_warranty_deletion();
@@ -0,0 +1,61 @@
+-- Migration: Store claim_status_summary on warranties
+-- Description: Denormalized claim status (NO_CLAIMS / OPEN / FINISHED) kept current by triggers on
+-- warranty_claims, so warranty list queries no longer join and group claims on every read.
+
+ALTER TABLE warranties ADD COLUMN IF NOT EXISTS claim_status_summary VARCHAR(20) NOT NULL DEFAULT 'NO_CLAIMS';
+
+-- Recompute the summary of one warranty from its claims
+CREATE OR REPLACE FUNCTION refresh_warranty_claim_status_summary(p_warranty_id INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    new_summary VARCHAR(20);
+BEGIN
+    SELECT CASE
+               WHEN COUNT(*) = 0 THEN 'NO_CLAIMS'
+               WHEN BOOL_OR(status IN ('Submitted', 'In Progress')) THEN 'OPEN'
+               ELSE 'FINISHED'
+           END
+      INTO new_summary
+      FROM warranty_claims
+     WHERE warranty_id = p_warranty_id;
+
+    UPDATE warranties
+       SET claim_status_summary = new_summary
+     WHERE id = p_warranty_id
+       AND claim_status_summary IS DISTINCT FROM new_summary;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION warranty_claims_refresh_summary()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM refresh_warranty_claim_status_summary(NEW.warranty_id);
+    END IF;
+    IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.warranty_id IS DISTINCT FROM NEW.warranty_id) THEN
+        PERFORM refresh_warranty_claim_status_summary(OLD.warranty_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS warranty_claims_status_summary ON warranty_claims;
+
+CREATE TRIGGER warranty_claims_status_summary
+    AFTER INSERT OR UPDATE OF status, warranty_id OR DELETE ON warranty_claims
+    FOR EACH ROW
+    EXECUTE FUNCTION warranty_claims_refresh_summary();
+
+-- Backfill existing warranties
+UPDATE warranties w
+   SET claim_status_summary = s.summary
+  FROM (
+        SELECT warranty_id,
+               CASE WHEN BOOL_OR(status IN ('Submitted', 'In Progress')) THEN 'OPEN' ELSE 'FINISHED' END AS summary
+          FROM warranty_claims
+         GROUP BY warranty_id
+       ) s
+ WHERE w.id = s.warranty_id
+   AND w.claim_status_summary IS DISTINCT FROM s.summary;
+
+CREATE INDEX IF NOT EXISTS idx_warranties_user_claim_status ON warranties(user_id, claim_status_summary);
@@ -0,0 +1,17 @@
+-- Migration: Materialized global warranty statistics
+-- Description: Pre-aggregated warranty counts per (is_lifetime, expiration_date) for /statistics/global.
+-- Date-relative buckets (active, expired, expiring soon, timeline) are summed from this small view at
+-- request time. Refreshed CONCURRENTLY by the scheduler and after bulk imports.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS global_warranty_expiration_stats AS
+SELECT
+    is_lifetime,
+    expiration_date,
+    COALESCE(expiration_date, 'infinity'::date) AS expiration_bucket,
+    COUNT(*) AS warranty_count
+FROM warranties
+GROUP BY is_lifetime, expiration_date;
+
+-- REFRESH ... CONCURRENTLY requires a unique index covering all rows
+CREATE UNIQUE INDEX IF NOT EXISTS idx_global_warranty_expiration_stats_key
+    ON global_warranty_expiration_stats (is_lifetime, expiration_bucket);
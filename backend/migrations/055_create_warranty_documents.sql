@@ -0,0 +1,82 @@
+-- Migration: Create warranty_documents ownership map
+-- Description: One row per document referenced by a warranty (local upload path or Paperless-ngx id),
+-- so document authorization is a single primary-key lookup instead of OR-ing four path or id columns.
+-- Kept current by a trigger on warranties, whichever code path writes the document columns.
+
+CREATE TABLE IF NOT EXISTS warranty_documents (
+    storage_key TEXT NOT NULL,          -- 'uploads/<file>' for local files, 'paperless:<id>' for Paperless-ngx
+    warranty_id INTEGER NOT NULL REFERENCES warranties(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    kind VARCHAR(10) NOT NULL,          -- invoice, manual, other or photo
+    PRIMARY KEY (storage_key, warranty_id, kind)
+);
+
+CREATE INDEX IF NOT EXISTS idx_warranty_documents_warranty ON warranty_documents(warranty_id);
+
+-- Rebuild the rows of one warranty from its document columns
+CREATE OR REPLACE FUNCTION refresh_warranty_documents(p_warranty_id INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM warranty_documents WHERE warranty_id = p_warranty_id;
+
+    INSERT INTO warranty_documents (storage_key, warranty_id, user_id, kind)
+    SELECT d.storage_key, w.id, w.user_id, d.kind
+      FROM warranties w
+     CROSS JOIN LATERAL (VALUES
+            (w.invoice_path, 'invoice'),
+            (w.manual_path, 'manual'),
+            (w.other_document_path, 'other'),
+            (w.product_photo_path, 'photo'),
+            ('paperless:' || w.paperless_invoice_id, 'invoice'),
+            ('paperless:' || w.paperless_manual_id, 'manual'),
+            ('paperless:' || w.paperless_other_id, 'other'),
+            ('paperless:' || w.paperless_photo_id, 'photo')
+           ) AS d(storage_key, kind)
+     WHERE w.id = p_warranty_id
+       AND d.storage_key IS NOT NULL
+       AND d.storage_key <> ''
+    ON CONFLICT DO NOTHING;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION warranties_refresh_documents()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_warranty_documents(NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS warranties_documents_insert ON warranties;
+DROP TRIGGER IF EXISTS warranties_documents_update ON warranties;
+
+CREATE TRIGGER warranties_documents_insert
+    AFTER INSERT ON warranties
+    FOR EACH ROW
+    EXECUTE FUNCTION warranties_refresh_documents();
+
+-- Deletions are handled by ON DELETE CASCADE
+CREATE TRIGGER warranties_documents_update
+    AFTER UPDATE OF user_id, invoice_path, manual_path, other_document_path, product_photo_path,
+                    paperless_invoice_id, paperless_manual_id, paperless_other_id, paperless_photo_id
+    ON warranties
+    FOR EACH ROW
+    EXECUTE FUNCTION warranties_refresh_documents();
+
+-- Backfill existing warranties
+INSERT INTO warranty_documents (storage_key, warranty_id, user_id, kind)
+SELECT d.storage_key, w.id, w.user_id, d.kind
+  FROM warranties w
+ CROSS JOIN LATERAL (VALUES
+        (w.invoice_path, 'invoice'),
+        (w.manual_path, 'manual'),
+        (w.other_document_path, 'other'),
+        (w.product_photo_path, 'photo'),
+        ('paperless:' || w.paperless_invoice_id, 'invoice'),
+        ('paperless:' || w.paperless_manual_id, 'manual'),
+        ('paperless:' || w.paperless_other_id, 'other'),
+        ('paperless:' || w.paperless_photo_id, 'photo')
+       ) AS d(storage_key, kind)
+ WHERE d.storage_key IS NOT NULL
+   AND d.storage_key <> ''
+ON CONFLICT DO NOTHING;
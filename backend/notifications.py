@@ -38,16 +38,25 @@ except ImportError:
 
 # Import database functions
 try:
-    from .db_handler import get_site_setting
+    from .db_handler import get_site_setting, refresh_global_statistics
     DB_HANDLER_IMPORTED = True
 except ImportError:
     try:
-        from db_handler import get_site_setting
+        from db_handler import get_site_setting, refresh_global_statistics
         DB_HANDLER_IMPORTED = True
     except ImportError:
         DB_HANDLER_IMPORTED = False
         def get_site_setting(key, default=None):
             return default
+        def refresh_global_statistics():
+            return False
+
+try:
+    from .change_tracking import purge_expired_deletions
+    from .schema_registry import schema_registry
+except ImportError:
+    from change_tracking import purge_expired_deletions
+    from schema_registry import schema_registry
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -159,22 +168,10 @@ def format_expiration_email(user, warranties, get_db_connection, release_db_conn
     email_base_url = os.environ.get('APP_BASE_URL')
     if email_base_url is None:
         # Fall back to database setting if environment variable is not set
-        conn = None
-        email_base_url = 'http://localhost:8080'  # Default fallback
-        try:
-            conn = get_db_connection()
-            with conn.cursor() as cur:
-                cur.execute("SELECT value FROM site_settings WHERE key = 'email_base_url'")
-                result = cur.fetchone()
-                if result:
-                    email_base_url = result[0]
-                else:
-                    logger.warning("email_base_url setting not found, using default.")
-        except Exception as e:
-            logger.error(f"Error fetching email_base_url from settings: {e}. Using default.")
-        finally:
-            if conn:
-                release_db_connection(conn)
+        email_base_url = get_site_setting('email_base_url', None)
+        if not email_base_url:
+            logger.warning("email_base_url setting not found, using default.")
+            email_base_url = 'http://localhost:8080'  # Default fallback
     
     # Ensure base URL doesn't end with a slash
     email_base_url = email_base_url.rstrip('/')
@@ -310,11 +307,7 @@ def process_email_notifications(all_warranties, eligible_user_ids, is_manual, ge
         try:
             conn_manual = get_db_connection()
             with conn_manual.cursor() as cur:
-                cur.execute("""
-                    SELECT column_name FROM information_schema.columns 
-                    WHERE table_name='user_preferences' AND column_name='notification_channel'
-                """)
-                has_channel_column = bool(cur.fetchone())
+                has_channel_column = schema_registry.has_column('user_preferences', 'notification_channel')
                 
                 if has_channel_column:
                     cur.execute("""
@@ -540,16 +533,9 @@ def send_expiration_notifications(manual_trigger=False, get_db_connection=None,
                 utc_now = datetime.now(UTC)
                 
                 # Check if required columns exist for dynamic query building
-                cur.execute("""
-                    SELECT column_name FROM information_schema.columns 
-                    WHERE table_name='user_preferences' 
-                    AND column_name IN ('notification_channel', 'apprise_notification_time', 'apprise_timezone')
-                """)
-                existing_columns = [row[0] for row in cur.fetchall()]
-                
-                has_notification_channel = 'notification_channel' in existing_columns
-                has_apprise_notification_time = 'apprise_notification_time' in existing_columns
-                has_apprise_timezone = 'apprise_timezone' in existing_columns
+                has_notification_channel = schema_registry.has_column('user_preferences', 'notification_channel')
+                has_apprise_notification_time = schema_registry.has_column('user_preferences', 'apprise_notification_time')
+                has_apprise_timezone = schema_registry.has_column('user_preferences', 'apprise_timezone')
                 
                 # Build dynamic query based on available columns
                 select_fields = [
@@ -728,6 +714,17 @@ def init_scheduler(app, get_db_connection, release_db_connection):
 
             # Schedule the new context-aware wrapper
             scheduler.add_job(func=notification_job_with_context, trigger="interval", minutes=2, id='notification_job')
+            # Daily purge of delta-sync tombstones past their retention window
+            scheduler.add_job(
+                func=purge_expired_deletions,
+                args=(get_db_connection, release_db_connection),
+                trigger="interval", hours=24, id='sync_tombstone_purge_job'
+            )
+            # Keep the materialized global statistics reasonably fresh
+            scheduler.add_job(
+                func=refresh_global_statistics,
+                trigger="interval", minutes=5, id='global_statistics_refresh_job'
+            )
             scheduler.start()
             logger.info("✅ Notification scheduler started - checking every 2 minutes")
             
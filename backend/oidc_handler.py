@@ -9,12 +9,16 @@ try:
     # Try relative imports (when modules are in same directory)
     from .extensions import oauth
     from .db_handler import get_db_connection, release_db_connection
-    from .auth_utils import generate_token
+    from .auth_utils import issue_session_tokens
+    from .user_cache import user_cache
+    from .schema_registry import schema_registry
 except ImportError:
     # Fallback to direct imports
     from extensions import oauth
     from db_handler import get_db_connection, release_db_connection
-    from auth_utils import generate_token
+    from auth_utils import issue_session_tokens
+    from user_cache import user_cache
+    from schema_registry import schema_registry
 
 import logging
 logger = logging.getLogger(__name__) # Or use current_app.logger inside routes
@@ -217,13 +221,7 @@ def oidc_callback_route():
                         logger.info(f"[OIDC_HANDLER] Updated admin status for OIDC user ID {user_id} to {is_admin} based on group membership.")
             else:
                 # Check if registration is enabled before creating new users
-                cur.execute("""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables
-                        WHERE table_name = 'site_settings'
-                    )
-                """)
-                table_exists = cur.fetchone()[0]
+                table_exists = schema_registry.has_table('site_settings')
 
                 registration_enabled = True
                 if table_exists:
@@ -302,7 +300,9 @@ def oidc_callback_route():
                 logger.info(f"[OIDC_HANDLER] New OIDC user created with ID {user_id} for sub {oidc_subject}")
 
             if user_id:
-                app_session_token = generate_token(user_id) # Generate app-specific JWT
+                # Use a different UUID for session_token in DB if needed, or re-use app_session_token if appropriate for your session model
+                db_session_token = str(uuid.uuid4())
+                app_session_token, app_refresh_token = issue_session_tokens(cur, user_id, db_session_token) # Generate app-specific JWT(s)
 
                 # Update last login timestamp
                 cur.execute('UPDATE users SET last_login = %s WHERE id = %s', (datetime.now(UTC), user_id))
@@ -310,8 +310,6 @@ def oidc_callback_route():
                 # Log OIDC session in user_sessions table
                 ip_address = request.remote_addr
                 user_agent = request.headers.get('User-Agent', '')
-                # Use a different UUID for session_token in DB if needed, or re-use app_session_token if appropriate for your session model
-                db_session_token = str(uuid.uuid4())
                 expires_at = datetime.now(UTC) + current_app.config['JWT_EXPIRATION_DELTA']
 
                 cur.execute(
@@ -319,9 +317,12 @@ def oidc_callback_route():
                     (user_id, db_session_token, expires_at, ip_address, user_agent, 'oidc')
                 )
                 conn.commit()
+                user_cache.invalidate(user_id) # Email or admin status may have been synced from the provider
 
                 frontend_url = os.environ.get('FRONTEND_URL', current_app.config.get('APP_BASE_URL', 'http://localhost:8080')).rstrip('/')
                 redirect_target = f"{frontend_url}/auth-redirect.html?token={app_session_token}"
+                if app_refresh_token:
+                    redirect_target += f"&refresh_token={app_refresh_token}"
                 if is_new_user:
                     redirect_target += "&new_user=true"
 
@@ -12,6 +12,11 @@ import os
 from io import BytesIO
 import hashlib
 
+try:
+    from .db_handler import get_site_settings
+except ImportError:
+    from db_handler import get_site_settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -404,7 +409,61 @@ class PaperlessHandler:
             return False, None, "Document not found in Paperless-ngx", None
         else:
             return False, None, f"Retrieval failed: {str(last_error) if last_error else 'All endpoints failed'}", None
-    
+
+    def open_document_stream(self, document_id: int, range_header: Optional[str] = None,
+                             conditional_headers: Optional[Dict[str, str]] = None) -> Tuple[bool, Optional[requests.Response], str]:
+        """
+        Open a streaming response for a document's content, forwarding an HTTP Range header
+
+        Uses the same endpoints as get_document_preview. The caller must close the
+        returned response; its status is 200, 206, 304 or 416 depending on whether
+        Paperless-ngx honoured the range and conditional headers.
+
+        Args:
+            document_id: Paperless-ngx document ID
+            range_header: Value of the client's Range header, if any
+            conditional_headers: Client's If-None-Match / If-Modified-Since / If-Range headers
+
+        Returns:
+            (success: bool, response: Optional[requests.Response], message: str)
+        """
+        # identity encoding keeps Content-Length/Content-Range in terms of the bytes we relay
+        headers = {'Accept': '*/*', 'Accept-Encoding': 'identity'}
+        if range_header:
+            headers['Range'] = range_header
+        headers.update(conditional_headers or {})
+
+        last_error = None
+        for endpoint_name, endpoint_path in [
+            ('preview', f'/api/documents/{document_id}/preview/'),
+            ('download', f'/api/documents/{document_id}/download/'),
+        ]:
+            try:
+                logger.info(f"Streaming document {endpoint_name} from Paperless-ngx: {document_id} (range: {range_header})")
+                response = self.get(endpoint_path, headers=headers, stream=True, timeout=30)
+                if response.status_code == 416:
+                    return True, response, f"Range not satisfiable via {endpoint_name}"
+                response.raise_for_status()
+                return True, response, f"Document stream opened via {endpoint_name}"
+            except requests.exceptions.HTTPError as e:
+                status_code = e.response.status_code if e.response is not None else None
+                if status_code == 304:
+                    # _request treats every 3xx as a redirect; 304 answers a conditional request
+                    return True, e.response, f"Document not modified via {endpoint_name}"
+                logger.warning(f"Failed to stream document {document_id} via {endpoint_name}: HTTP {status_code}")
+                if e.response is not None:
+                    e.response.close()
+                last_error = e
+                if status_code != 404:
+                    return False, None, f"Failed to retrieve document: HTTP {status_code}"
+            except Exception as e:
+                logger.warning(f"Error streaming document {document_id} via {endpoint_name}: {e}")
+                last_error = e
+
+        if isinstance(last_error, requests.exceptions.HTTPError):
+            return False, None, "Document not found in Paperless-ngx"
+        return False, None, f"Retrieval failed: {str(last_error) if last_error else 'All endpoints failed'}"
+
     def get_document_thumbnail(self, document_id: int) -> Tuple[bool, Optional[bytes], str]:
         """
         Get document thumbnail from Paperless-ngx
@@ -721,33 +780,28 @@ def get_paperless_handler(conn) -> Optional[PaperlessHandler]:
     Get a configured Paperless handler from site settings
     
     Args:
-        conn: Database connection
+        conn: Database connection (unused; settings come from the site settings cache)
         
     Returns:
         PaperlessHandler instance or None if not configured/enabled
     """
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT key, value FROM site_settings 
-                WHERE key IN ('paperless_enabled', 'paperless_url', 'paperless_api_token')
-            """)
-            settings = {row[0]: row[1] for row in cur.fetchall()}
-            
-            # Check if Paperless-ngx is enabled
-            if settings.get('paperless_enabled', 'false').lower() != 'true':
-                return None
-            
-            # Check required settings
-            paperless_url = settings.get('paperless_url', '').strip()
-            paperless_token = settings.get('paperless_api_token', '').strip()
-            
-            if not paperless_url or not paperless_token:
-                logger.warning("Paperless-ngx is enabled but URL or API token is missing")
-                return None
-            
-            return PaperlessHandler(paperless_url, paperless_token)
+        settings = get_site_settings()
+        
+        # Check if Paperless-ngx is enabled
+        if settings.get('paperless_enabled', 'false').lower() != 'true':
+            return None
+        
+        # Check required settings
+        paperless_url = settings.get('paperless_url', '').strip()
+        paperless_token = settings.get('paperless_api_token', '').strip()
+        
+        if not paperless_url or not paperless_token:
+            logger.warning("Paperless-ngx is enabled but URL or API token is missing")
+            return None
+        
+        return PaperlessHandler(paperless_url, paperless_token)
             
     except Exception as e:
         logger.error(f"Error creating Paperless handler: {e}")
-        return None 
+        return None 
\ No newline at end of file
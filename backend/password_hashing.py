@@ -0,0 +1,62 @@
+# backend/password_hashing.py
+"""
+bcrypt hashing and verification that does not stall gevent workers.
+
+bcrypt is CPU-bound for tens to hundreds of milliseconds per call. Under
+gevent workers (gunicorn_config.py monkey patches the process) the work is
+run on a small pool of native threads, which bcrypt releases the GIL in, so
+other greenlets keep being served meanwhile. At most BCRYPT_MAX_CONCURRENCY
+hashes run at once per worker; further calls queue for a free thread.
+Without gevent the calls run inline as before.
+"""
+import os
+import logging
+
+try:
+    from .extensions import bcrypt
+except ImportError:
+    from extensions import bcrypt
+
+logger = logging.getLogger(__name__)
+
+def _int_from_env(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"{name} is not a valid integer, using {default}")
+        return default
+
+BCRYPT_MAX_CONCURRENCY = max(_int_from_env('BCRYPT_MAX_CONCURRENCY', 2), 1)
+
+_threadpool = None
+_threadpool_pid = None
+
+def _get_threadpool():
+    """Return this process's bcrypt thread pool, or None when gevent is not active."""
+    global _threadpool, _threadpool_pid
+    try:
+        from gevent import monkey
+    except ImportError:
+        return None
+    if not monkey.is_module_patched('socket'):
+        return None
+    if _threadpool is None or _threadpool_pid != os.getpid():
+        # Thread pools do not survive fork; create one per worker process
+        from gevent.threadpool import ThreadPool
+        _threadpool = ThreadPool(BCRYPT_MAX_CONCURRENCY)
+        _threadpool_pid = os.getpid()
+    return _threadpool
+
+def _run(func, *args):
+    threadpool = _get_threadpool()
+    if threadpool is None:
+        return func(*args)
+    return threadpool.apply(func, args)
+
+def hash_password(password: str) -> str:
+    """Return a bcrypt hash of password as a string."""
+    return _run(bcrypt.generate_password_hash, password).decode('utf-8')
+
+def check_password(password_hash: str, password: str) -> bool:
+    """Return True if password matches password_hash."""
+    return _run(bcrypt.check_password_hash, password_hash, password)
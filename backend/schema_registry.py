@@ -0,0 +1,69 @@
+# backend/schema_registry.py
+"""
+Per-process snapshot of which tables and columns exist in the database.
+
+Older code paths probe information_schema on every request to cope with
+partially migrated databases. Migrations run before the application starts
+(Docker/entrypoint.sh), so create_app() loads the schema once after that and
+forked workers inherit the snapshot. If the startup load failed, the first
+lookup loads it instead. Code that changes the schema at runtime calls
+invalidate() so the next lookup reloads it.
+"""
+import threading
+import logging
+
+try:
+    from . import db_handler
+except ImportError:
+    import db_handler
+
+logger = logging.getLogger(__name__)
+
+class SchemaRegistry:
+    """Lazily loaded {table: frozenset(columns)} map of the current schema."""
+
+    def __init__(self):
+        self._columns = None
+        self._lock = threading.Lock()
+
+    def load(self, cur):
+        cur.execute("""
+            SELECT table_name, column_name
+            FROM information_schema.columns
+            WHERE table_schema = current_schema()
+        """)
+        tables = {}
+        for table_name, column_name in cur.fetchall():
+            tables.setdefault(table_name, set()).add(column_name)
+        self._columns = {table_name: frozenset(columns) for table_name, columns in tables.items()}
+        logger.info(f"Schema registry loaded: {len(self._columns)} tables")
+
+    def refresh(self):
+        """(Re)load the schema on a dedicated connection, outside any request transaction."""
+        conn = db_handler.get_db_connection(request_scoped=False)
+        try:
+            with conn.cursor() as cur:
+                self.load(cur)
+            conn.rollback()
+        finally:
+            db_handler.release_db_connection(conn)
+
+    def _tables(self):
+        columns = self._columns
+        if columns is None:
+            with self._lock:
+                if self._columns is None:
+                    self.refresh()
+                columns = self._columns
+        return columns
+
+    def has_table(self, table_name):
+        return table_name in self._tables()
+
+    def has_column(self, table_name, column_name):
+        return column_name in self._tables().get(table_name, ())
+
+    def invalidate(self):
+        self._columns = None
+
+schema_registry = SchemaRegistry()
@@ -0,0 +1,127 @@
+# backend/serialization.py
+"""
+Shared JSON serialization helpers.
+
+- rows_to_dicts(): turns cursor rows into JSON-ready dicts using per-column
+  converters chosen once from cursor.description type codes, instead of
+  type-checking every value of every row.
+- convert_decimals(): recursive Decimal -> float for hand-built payloads.
+- init_json_provider(): installs an orjson-backed Flask JSON provider when
+  orjson is available (falls back to Flask's default provider otherwise).
+"""
+import logging
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL type OIDs (as reported in cursor.description type_code)
+DATE_OID = 1082
+TIME_OID = 1083
+TIMESTAMP_OID = 1114
+TIMESTAMPTZ_OID = 1184
+TIMETZ_OID = 1266
+NUMERIC_OID = 1700
+
+def _isoformat(value):
+    return value.isoformat()
+
+_CONVERTERS_BY_TYPE = {
+    DATE_OID: _isoformat,
+    TIME_OID: _isoformat,
+    TIMESTAMP_OID: _isoformat,
+    TIMESTAMPTZ_OID: _isoformat,
+    TIMETZ_OID: _isoformat,
+    NUMERIC_OID: float,
+}
+
+def column_converters(description):
+    """Return (column names, [(column name, converter)]) for a cursor.description.
+
+    Only columns whose type needs converting for JSON (dates, times and
+    numerics) are listed, so rows with no such columns are copied as-is.
+    """
+    columns = [desc[0] for desc in description]
+    converters = [
+        (desc[0], _CONVERTERS_BY_TYPE[desc[1]])
+        for desc in description
+        if desc[1] in _CONVERTERS_BY_TYPE
+    ]
+    return columns, converters
+
+def rows_to_dicts(cur, rows):
+    """Convert rows fetched from cur into JSON-ready dicts (dates as ISO strings, numerics as float)."""
+    columns, converters = column_converters(cur.description)
+    result = []
+    for row in rows:
+        row_dict = dict(zip(columns, row))
+        for name, convert in converters:
+            value = row_dict[name]
+            if value is not None:
+                row_dict[name] = convert(value)
+        result.append(row_dict)
+    return result
+
+def row_to_dict(cur, row):
+    """Single-row variant of rows_to_dicts."""
+    return rows_to_dicts(cur, [row])[0]
+
+def convert_decimals(obj):
+    """Recursively convert Decimal objects to float in dicts/lists for JSON serialization."""
+    if isinstance(obj, dict):
+        return {k: convert_decimals(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_decimals(i) for i in obj]
+    elif isinstance(obj, Decimal):
+        return float(obj)
+    else:
+        return obj
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    Dates, datetimes, Decimals and other types orjson does not handle natively
+    are passed to Flask's default() so responses stay identical to the default
+    provider. Calls with json.dumps-specific keyword arguments are delegated to
+    the default provider.
+    """
+
+    def _options(self):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            # Pretty-printed output is a debugging aid; keep the default behaviour
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def init_json_provider(app):
+    """Use the orjson provider for app.json when orjson is installed."""
+    if not ORJSON_AVAILABLE:
+        logger.info("orjson not available, using default JSON provider")
+        return
+    app.json = OrjsonProvider(app)
+    logger.info("Using orjson JSON provider")
@@ -0,0 +1,148 @@
+# backend/site_settings_cache.py
+"""
+Process-wide cache of the site_settings table.
+
+The whole (small) table is loaded at once and served from memory. Writers
+send a NOTIFY on SITE_SETTINGS_CHANNEL inside their transaction (see
+notify_site_settings_changed), and each worker process runs a listener on a
+dedicated connection that drops the cache when a notification arrives, so a
+change made through any worker is visible in all of them right after commit.
+
+The listener is only started in processes that called enable_listener()
+(gunicorn's post_fork hook), so a read during app preloading never leaves a
+thread and its socket in the master for the workers to inherit. Without a
+connected listener (master, startup, database restarts) entries are only
+trusted for fallback_ttl_seconds; max_age_seconds bounds staleness even if a
+notification is lost.
+"""
+import os
+import select
+import threading
+import time
+import logging
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+SITE_SETTINGS_CHANNEL = 'site_settings_changed'
+
+def notify_site_settings_changed(cur):
+    """Queue a cache invalidation for all workers; delivered when the transaction commits."""
+    cur.execute("SELECT pg_notify(%s, '')", (SITE_SETTINGS_CHANNEL,))
+
+class SiteSettingsCache:
+    """Snapshot of site_settings with LISTEN/NOTIFY invalidation across worker processes."""
+
+    def __init__(self, connection, connect_kwargs,
+                 max_age_seconds=300, fallback_ttl_seconds=5, reconnect_delay_seconds=5):
+        # connection() returns a context manager yielding the connection to read with
+        self._connection = connection
+        self._connect_kwargs = connect_kwargs
+        self.max_age_seconds = max_age_seconds
+        self.fallback_ttl_seconds = fallback_ttl_seconds
+        self.reconnect_delay_seconds = reconnect_delay_seconds
+        self._settings = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._listener_enabled_pid = None
+        self._listener_pid = None
+        self._listening = False
+        self.loads = 0
+        self.notifications = 0
+
+    def get_all(self):
+        """Return a copy of all settings as a {key: value} dict. Raises if they cannot be loaded."""
+        self._ensure_listener()
+        settings = self._settings
+        listening = self._listening and self._listener_pid == os.getpid()
+        max_age = self.max_age_seconds if listening else self.fallback_ttl_seconds
+        if settings is None or time.monotonic() - self._loaded_at > max_age:
+            with self._lock:
+                settings = self._settings
+                if settings is None or time.monotonic() - self._loaded_at > max_age:
+                    settings = self._load()
+        return dict(settings)
+
+    def get(self, key, default=None):
+        return self.get_all().get(key, default)
+
+    def invalidate(self):
+        self._generation += 1
+        self._settings = None
+
+    def _load(self):
+        generation = self._generation
+        with self._connection() as conn:
+            with conn.cursor() as cur:
+                # Checked rather than caught: an error would abort a borrowed request transaction
+                cur.execute("SELECT to_regclass('site_settings') IS NOT NULL")
+                if cur.fetchone()[0]:
+                    cur.execute('SELECT key, value FROM site_settings')
+                    settings = {row[0]: row[1] for row in cur.fetchall()}
+                else:
+                    settings = {}
+        self._settings = settings
+        # If invalidated while loading, serve this snapshot once but reload on the next read
+        self._loaded_at = time.monotonic() if generation == self._generation else 0.0
+        self.loads += 1
+        return settings
+
+    def enable_listener(self):
+        """Allow this process to run a listener; it starts on the next read, inside the worker's event loop."""
+        self._listener_enabled_pid = os.getpid()
+
+    def _ensure_listener(self):
+        # Threads do not survive fork, so every worker process starts its own listener
+        if self._listener_pid == os.getpid() or self._listener_enabled_pid != os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            self._listening = False
+            self._settings = None
+            thread = threading.Thread(target=self._listen_forever, name='site-settings-listener', daemon=True)
+            thread.start()
+
+    def _listen_forever(self):
+        pid = os.getpid()
+        while self._listener_pid == pid:
+            conn = None
+            try:
+                conn = psycopg2.connect(**self._connect_kwargs)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN {SITE_SETTINGS_CHANNEL}')
+                # Changes made while we were not listening would have been missed
+                self.invalidate()
+                self._listening = True
+                logger.info(f"Listening for site settings changes (pid {pid})")
+                while self._listener_pid == pid:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        self.notifications += 1
+                        self.invalidate()
+            except Exception as e:
+                logger.warning(f"Site settings listener error, retrying in {self.reconnect_delay_seconds}s: {e}")
+            finally:
+                self._listening = False
+                if conn is not None and not conn.closed:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(self.reconnect_delay_seconds)
+
+    def stats(self):
+        return {
+            'loaded': self._settings is not None,
+            'listening': self._listening and self._listener_pid == os.getpid(),
+            'loads': self.loads,
+            'notifications': self.notifications,
+            'pid': os.getpid()
+        }
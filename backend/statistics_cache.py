@@ -0,0 +1,113 @@
+# backend/statistics_cache.py
+"""
+Bounded per-worker cache for GET /statistics responses.
+
+Entries are keyed by (user_id, data version, expiring_soon_days, date, fields),
+so a write committed by any worker (which bumps the user's data version) or a
+date rollover makes older entries unreachable. Writes in this worker also drop
+the user's entries eagerly through invalidate_user().
+
+Values are the serialized JSON response bodies, so an entry costs about its
+length in memory. Besides the entry count, the cache is bounded by the total
+size of the bodies (STATISTICS_CACHE_MAX_BYTES), which keeps a few accounts
+with long all_warranties lists from pushing a worker past its memory limit.
+"""
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class StatisticsCache:
+    """Thread-safe LRU cache of bytes values with a per-entry TTL, a total size bound and hit/miss counters."""
+
+    def __init__(self, max_entries=512, ttl_seconds=300, max_bytes=4 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._total_bytes -= len(value)
+
+    def set(self, key, value):
+        """Cache a bytes value; values larger than max_bytes are not cached."""
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._total_bytes += len(value)
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        """Drop every entry of a user (keys start with the user id)."""
+        with self._lock:
+            stale_keys = [key for key in self._entries if key[0] == user_id]
+            for key in stale_keys:
+                self._remove(key)
+            if stale_keys:
+                self.invalidations += len(stale_keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'pid': os.getpid()
+            }
+
+def _int_from_env(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"{name} is not a valid integer, using {default}")
+        return default
+
+statistics_cache = StatisticsCache(
+    max_entries=_int_from_env('STATISTICS_CACHE_MAX_ENTRIES', 512),
+    ttl_seconds=_int_from_env('STATISTICS_CACHE_TTL_SECONDS', 300),
+    max_bytes=_int_from_env('STATISTICS_CACHE_MAX_BYTES', 4 * 1024 * 1024)
+)
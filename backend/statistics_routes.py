@@ -1,17 +1,24 @@
 from flask import Blueprint, request, jsonify, current_app
 from datetime import date, timedelta
-from decimal import Decimal
 import logging
 
 # Use try-except pattern for imports to handle both Docker and development environments
 try:
     from . import db_handler
     from .auth_utils import token_required
-    from .db_handler import get_db_connection, release_db_connection
+    from .db_handler import get_db_connection, release_db_connection, get_site_settings
+    from .serialization import convert_decimals, rows_to_dicts
+    from .utils import add_user_display_name, parse_fields_param
+    from .statistics_cache import statistics_cache
+    from .change_tracking import get_user_data_version, user_data_etag, not_modified_response, set_etag_headers
 except ImportError:
     import db_handler
     from auth_utils import token_required
-    from db_handler import get_db_connection, release_db_connection
+    from db_handler import get_db_connection, release_db_connection, get_site_settings
+    from serialization import convert_decimals, rows_to_dicts
+    from utils import add_user_display_name, parse_fields_param
+    from statistics_cache import statistics_cache
+    from change_tracking import get_user_data_version, user_data_etag, not_modified_response, set_etag_headers
 
 # Create the statistics blueprint
 statistics_bp = Blueprint('statistics_bp', __name__)
@@ -19,17 +26,53 @@ statistics_bp = Blueprint('statistics_bp', __name__)
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Helper function
-def convert_decimals(obj):
-    """Recursively convert Decimal objects to float in dicts/lists for JSON serialization."""
-    if isinstance(obj, dict):
-        return {k: convert_decimals(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_decimals(i) for i in obj]
-    elif isinstance(obj, Decimal):
-        return float(obj)
-    else:
-        return obj
+# Top-level sections of GET /statistics, selectable with ?fields=
+STATISTICS_FIELDS = ('total', 'active', 'expired', 'expiring_soon', 'timeline', 'recent_warranties', 'all_warranties')
+
+# Row sources for fetch_warranty_counts: (is_lifetime, expiration_date, warranty_count)
+# either straight from warranties or from the materialized global summary
+WARRANTY_COUNT_SOURCE = "SELECT w.is_lifetime, w.expiration_date, 1 AS warranty_count FROM warranties w {where_clause}"
+GLOBAL_WARRANTY_COUNT_SOURCE = "SELECT s.is_lifetime, s.expiration_date, s.warranty_count FROM global_warranty_expiration_stats s"
+
+def fetch_warranty_counts(cur, source_query, params, today, expiring_soon_date, timeline_end):
+    """Compute the status counts and the monthly expiration timeline in one scan.
+
+    GROUPING SETS ((), (timeline_month)) returns one grand-total row carrying the
+    filtered counts, plus one row per month for warranties expiring inside the
+    timeline window (today, timeline_end]. Lifetime warranties count as active.
+    """
+    cur.execute(f"""
+        SELECT
+            GROUPING(timeline_month) = 1 AS is_total,
+            timeline_month,
+            COALESCE(SUM(warranty_count), 0) AS total,
+            COALESCE(SUM(warranty_count) FILTER (WHERE is_lifetime = TRUE OR expiration_date > %s), 0) AS active,
+            COALESCE(SUM(warranty_count) FILTER (WHERE is_lifetime = FALSE AND expiration_date <= %s), 0) AS expired,
+            COALESCE(SUM(warranty_count) FILTER (WHERE is_lifetime = FALSE AND expiration_date > %s AND expiration_date <= %s), 0) AS expiring_soon
+        FROM (
+            SELECT
+                src.is_lifetime, src.expiration_date, src.warranty_count,
+                CASE WHEN src.is_lifetime = FALSE AND src.expiration_date > %s AND src.expiration_date <= %s
+                     THEN date_trunc('month', src.expiration_date)::date
+                END AS timeline_month
+            FROM ({source_query}) src
+        ) counted
+        GROUP BY GROUPING SETS ((), (timeline_month))
+        ORDER BY timeline_month
+    """, [today, today, today, expiring_soon_date, today, timeline_end] + list(params))
+
+    # SUM() yields Decimal, counts are returned as ints
+    counts = {'total': 0, 'active': 0, 'expired': 0, 'expiring_soon': 0, 'timeline': []}
+    for is_total, timeline_month, total, active, expired, expiring_soon in cur.fetchall():
+        if is_total:
+            counts.update(total=int(total), active=int(active), expired=int(expired), expiring_soon=int(expiring_soon))
+        elif timeline_month is not None:
+            counts['timeline'].append({
+                "year": timeline_month.year,
+                "month": timeline_month.month,
+                "count": int(total)
+            })
+    return counts
 
 # ============================
 # Statistics Routes
@@ -41,10 +84,24 @@ def get_statistics():
     user_id = request.user['id']
     conn = None
 
+    try:
+        fields = parse_fields_param(request.args.get('fields'), STATISTICS_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    fields = fields or list(STATISTICS_FIELDS)
+
     try:
         conn = get_db_connection()
         today = date.today()
 
+        # Statistics depend on the user's data and on the current date
+        with conn.cursor() as cur:
+            data_version = get_user_data_version(cur, user_id)
+            etag = user_data_etag(user_id, data_version, today.isoformat(), ','.join(fields))
+        not_modified = not_modified_response(etag)
+        if not_modified:
+            return not_modified
+
         # Fetch user preference for expiring soon days
         expiring_soon_days = 30 # Default value
         try:
@@ -53,13 +110,18 @@ def get_statistics():
                 result = cur.fetchone()
                 if result and result[0] is not None:
                     expiring_soon_days = result[0]
-                    logger.info(f"Using custom expiring soon days: {expiring_soon_days} for user {user_id}")
+                    logger.debug(f"Using custom expiring soon days: {expiring_soon_days} for user {user_id}")
                 else:
-                    logger.info(f"Using default expiring soon days: {expiring_soon_days} for user {user_id}")
+                    logger.debug(f"Using default expiring soon days: {expiring_soon_days} for user {user_id}")
         except Exception as pref_err:
              # Log error fetching preference but continue with default
             logger.error(f"Error fetching expiring_soon_days preference for user {user_id}: {pref_err}. Using default 30 days.")
 
+        cache_key = (user_id, data_version, expiring_soon_days, today, ','.join(fields))
+        cached_body = statistics_cache.get(cache_key)
+        if cached_body is not None:
+            return set_etag_headers(current_app.response_class(cached_body, mimetype='application/json'), etag)
+
         expiring_soon_date = today + timedelta(days=expiring_soon_days)
         ninety_days_later = today + timedelta(days=90) # Keep timeline fixed or make configurable? For now, keep at 90.
 
@@ -80,132 +142,69 @@ def get_statistics():
             active_where = "AND"
         
         with conn.cursor() as cur:
-            # Get total count
-            cur.execute(f"SELECT COUNT(*) {from_clause} {where_clause}", params)
-            total_count = cur.fetchone()[0]
-            logger.info(f"Total warranties: {total_count}")
-            
-            # Get active count (includes lifetime)
-            cur.execute(f"SELECT COUNT(*) {from_clause} {where_clause} {active_where if where_clause else 'WHERE'} (w.is_lifetime = TRUE OR w.expiration_date > %s)", params + [today])
-            active_count = cur.fetchone()[0]
-            logger.info(f"Active warranties: {active_count}")
-            
-            # Get expired count (excludes lifetime)
-            cur.execute(f"SELECT COUNT(*) {from_clause} {where_clause} {active_where if where_clause else 'WHERE'} w.is_lifetime = FALSE AND w.expiration_date <= %s", params + [today])
-            expired_count = cur.fetchone()[0]
-            logger.info(f"Expired warranties: {expired_count}")
-            
-            # Get expiring soon count (excludes lifetime) using user preference
-            cur.execute(f"""SELECT COUNT(*) {from_clause} {where_clause} {active_where if where_clause else 'WHERE'}
-                          w.is_lifetime = FALSE AND w.expiration_date > %s AND w.expiration_date <= %s""",
-                      params + [today, expiring_soon_date])
-            expiring_soon_count = cur.fetchone()[0]
-            logger.info(f"Expiring soon ({expiring_soon_days} days) warranties: {expiring_soon_count}")
+            # Status counts and the 90-day timeline in a single pass
+            counts = fetch_warranty_counts(
+                cur, WARRANTY_COUNT_SOURCE.format(where_clause=where_clause), params,
+                today, expiring_soon_date, ninety_days_later
+            )
+            logger.debug(f"Warranty counts for user {user_id}: {counts}")
             
-            # Get expiration timeline (next 90 days, excluding lifetime)
-            cur.execute(f"""
-                SELECT 
-                    EXTRACT(YEAR FROM expiration_date) as year,
-                    EXTRACT(MONTH FROM expiration_date) as month,
-                    COUNT(*) as count
-                {from_clause} 
-                {where_clause} {active_where if where_clause else 'WHERE'} 
-                w.is_lifetime = FALSE AND w.expiration_date > %s AND w.expiration_date <= %s
-                GROUP BY EXTRACT(YEAR FROM expiration_date), EXTRACT(MONTH FROM expiration_date)
-                ORDER BY year, month
-            """, params + [today, ninety_days_later])
-            
-            timeline = []
-            for row in cur.fetchall():
-                year = int(row[0])
-                month = int(row[1])
-                count = row[2]
-                timeline.append({
-                    "year": year,
-                    "month": month,
-                    "count": count
-                })
-            
-            # Get recent expiring warranties (using user preference +/- 30 days for range, excluding lifetime)
-            # We'll keep the window around today somewhat fixed for 'recent', maybe +/- 30 days is still reasonable? Or should this also use expiring_soon_days?
-            # Let's adjust the recent window based on the preference for now: N days ago to N days later
-            days_ago_for_recent = today - timedelta(days=expiring_soon_days)
-            days_later_for_recent = expiring_soon_date # Same as the expiring soon cutoff
-            cur.execute(f"""
-                SELECT
-                    id, product_name, purchase_date, 
-                    warranty_duration_years, warranty_duration_months, warranty_duration_days,
-                    expiration_date, invoice_path, manual_path, other_document_path, product_url, purchase_price, is_lifetime
-                {from_clause}
-                {where_clause} {active_where if where_clause else 'WHERE'}
-                w.is_lifetime = FALSE AND w.expiration_date >= %s AND w.expiration_date <= %s
-                ORDER BY expiration_date
-                LIMIT 10
-            """, params + [days_ago_for_recent, days_later_for_recent])
-            
-            columns = [desc[0] for desc in cur.description]
             recent_warranties = []
+            if 'recent_warranties' in fields:
+                # Get recent expiring warranties (using user preference +/- 30 days for range, excluding lifetime)
+                # We'll keep the window around today somewhat fixed for 'recent', maybe +/- 30 days is still reasonable? Or should this also use expiring_soon_days?
+                # Let's adjust the recent window based on the preference for now: N days ago to N days later
+                days_ago_for_recent = today - timedelta(days=expiring_soon_days)
+                days_later_for_recent = expiring_soon_date # Same as the expiring soon cutoff
+                cur.execute(f"""
+                    SELECT
+                        id, product_name, purchase_date, 
+                        warranty_duration_years, warranty_duration_months, warranty_duration_days,
+                        expiration_date, invoice_path, manual_path, other_document_path, product_url, purchase_price, is_lifetime
+                    {from_clause}
+                    {where_clause} {active_where if where_clause else 'WHERE'}
+                    w.is_lifetime = FALSE AND w.expiration_date >= %s AND w.expiration_date <= %s
+                    ORDER BY expiration_date
+                    LIMIT 10
+                """, params + [days_ago_for_recent, days_later_for_recent])
             
-            for row in cur.fetchall():
-                warranty = dict(zip(columns, row))
-                
-                # Convert dates to string format
-                if warranty['purchase_date']:
-                    warranty['purchase_date'] = warranty['purchase_date'].isoformat()
-                if warranty['expiration_date']:
-                    warranty['expiration_date'] = warranty['expiration_date'].isoformat()
-                
-                # Convert Decimal objects to float for JSON serialization
-                if warranty.get('purchase_price') and isinstance(warranty['purchase_price'], Decimal):
-                    warranty['purchase_price'] = float(warranty['purchase_price'])
-                    
-                recent_warranties.append(warranty)
+                recent_warranties = rows_to_dicts(cur, cur.fetchall())
             
-            # *** ADD CODE TO FETCH ALL WARRANTIES ***
-            logger.info(f"Fetching all warranties for user {user_id}...")
-            cur.execute(f"""
-                SELECT
-                    id, product_name, purchase_date, 
-                    warranty_duration_years, warranty_duration_months, warranty_duration_days,
-                    expiration_date, invoice_path, manual_path, other_document_path, product_url, purchase_price, is_lifetime,
-                    model_number,
-                    (archived_at IS NOT NULL) AS is_archived
-                {from_clause}
-                {where_clause}
-                ORDER BY expiration_date DESC
-            """, params)
-
-            all_columns = [desc[0] for desc in cur.description]
             all_warranties_list = []
+            if 'all_warranties' in fields:
+                # *** ADD CODE TO FETCH ALL WARRANTIES ***
+                logger.debug(f"Fetching all warranties for user {user_id}...")
+                cur.execute(f"""
+                    SELECT
+                        id, product_name, purchase_date, 
+                        warranty_duration_years, warranty_duration_months, warranty_duration_days,
+                        expiration_date, invoice_path, manual_path, other_document_path, product_url, purchase_price, is_lifetime,
+                        model_number,
+                        (archived_at IS NOT NULL) AS is_archived
+                    {from_clause}
+                    {where_clause}
+                    ORDER BY expiration_date DESC
+                """, params)
 
-            for row in cur.fetchall():
-                warranty = dict(zip(all_columns, row))
-                
-                # Convert dates to string format
-                if warranty.get('purchase_date') and isinstance(warranty['purchase_date'], date):
-                    warranty['purchase_date'] = warranty['purchase_date'].isoformat()
-                if warranty.get('expiration_date') and isinstance(warranty['expiration_date'], date):
-                    warranty['expiration_date'] = warranty['expiration_date'].isoformat()
-                
-                # Convert Decimal objects to float for JSON serialization
-                if warranty.get('purchase_price') and isinstance(warranty['purchase_price'], Decimal):
-                    warranty['purchase_price'] = float(warranty['purchase_price'])
-                    
-                all_warranties_list.append(warranty)
-            logger.info(f"Fetched {len(all_warranties_list)} total warranties.")
-            # *** END OF ADDED CODE ***
+                all_warranties_list = rows_to_dicts(cur, cur.fetchall())
+                logger.debug(f"Fetched {len(all_warranties_list)} total warranties.")
+                # *** END OF ADDED CODE ***
 
             statistics = {
-                'total': total_count,
-                'active': active_count,
-                'expired': expired_count,
-                'expiring_soon': expiring_soon_count,
-                'timeline': timeline,
+                'total': counts['total'],
+                'active': counts['active'],
+                'expired': counts['expired'],
+                'expiring_soon': counts['expiring_soon'],
+                'timeline': counts['timeline'],
                 'recent_warranties': recent_warranties,
                 'all_warranties': all_warranties_list  # <-- Add the new list here
             }
             
-            return jsonify(convert_decimals(statistics))
+            statistics = convert_decimals({key: value for key, value in statistics.items() if key in fields})
+            # Cache the serialized body: compact, and its size is what the cache is bounded by
+            body = current_app.json.dumps(statistics).encode('utf-8')
+            statistics_cache.set(cache_key, body)
+            return set_etag_headers(current_app.response_class(body, mimetype='application/json'), etag)
     
     except Exception as e:
         logger.error(f"Error getting warranty statistics: {e}")
@@ -224,31 +223,25 @@ def get_global_statistics():
         # Check if global view is enabled for this user
         user_is_admin = request.user.get('is_admin', False)
         
+        # Get both global view settings (cached)
+        settings = get_site_settings()
+        
+        # Check if global view is enabled at all
+        global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
+        if not global_view_enabled:
+            return jsonify({"error": "Global view is disabled by administrator"}), 403
+        
+        # Check if global view is restricted to admins only
+        admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
+        if admin_only and not user_is_admin:
+            return jsonify({"error": "Global view is restricted to administrators only"}), 403
+        
         conn = get_db_connection()
-        with conn.cursor() as cur:
-            # Get both global view settings
-            cur.execute("SELECT key, value FROM site_settings WHERE key IN ('global_view_enabled', 'global_view_admin_only')")
-            settings = {row[0]: row[1] for row in cur.fetchall()}
-            
-            # Check if global view is enabled at all
-            global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
-            if not global_view_enabled:
-                return jsonify({"error": "Global view is disabled by administrator"}), 403
-            
-            # Check if global view is restricted to admins only
-            admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
-            if admin_only and not user_is_admin:
-                return jsonify({"error": "Global view is restricted to administrators only"}), 403
         
-        # Release the connection since we'll get a new one below
-        release_db_connection(conn)
-        conn = None
-
         # Get user's expiring soon days preference (for consistency)
         user_id = request.user['id']
         expiring_soon_days = 30  # Default value
         
-        conn = get_db_connection()
         try:
             with conn.cursor() as cur:
                 cur.execute("SELECT expiring_soon_days FROM user_preferences WHERE user_id = %s", (user_id,))
@@ -263,48 +256,9 @@ def get_global_statistics():
         ninety_days_later = today + timedelta(days=90)
         
         with conn.cursor() as cur:
-            # Global statistics query - all warranties from all users
-            
-            # Get total count
-            cur.execute("SELECT COUNT(*) FROM warranties w")
-            total_count = cur.fetchone()[0]
-            
-            # Get active count (includes lifetime)
-            cur.execute("SELECT COUNT(*) FROM warranties w WHERE w.is_lifetime = TRUE OR w.expiration_date > %s", (today,))
-            active_count = cur.fetchone()[0]
-            
-            # Get expired count (excludes lifetime)
-            cur.execute("SELECT COUNT(*) FROM warranties w WHERE w.is_lifetime = FALSE AND w.expiration_date <= %s", (today,))
-            expired_count = cur.fetchone()[0]
-            
-            # Get expiring soon count (excludes lifetime)
-            cur.execute("""SELECT COUNT(*) FROM warranties w WHERE
-                          w.is_lifetime = FALSE AND w.expiration_date > %s AND w.expiration_date <= %s""",
-                      (today, expiring_soon_date))
-            expiring_soon_count = cur.fetchone()[0]
-            
-            # Get expiration timeline (next 90 days, excluding lifetime)
-            cur.execute("""
-                SELECT 
-                    EXTRACT(YEAR FROM expiration_date) as year,
-                    EXTRACT(MONTH FROM expiration_date) as month,
-                    COUNT(*) as count
-                FROM warranties w 
-                WHERE w.is_lifetime = FALSE AND w.expiration_date > %s AND w.expiration_date <= %s
-                GROUP BY EXTRACT(YEAR FROM expiration_date), EXTRACT(MONTH FROM expiration_date)
-                ORDER BY year, month
-            """, (today, ninety_days_later))
-            
-            timeline = []
-            for row in cur.fetchall():
-                year = int(row[0])
-                month = int(row[1])
-                count = row[2]
-                timeline.append({
-                    "year": year,
-                    "month": month,
-                    "count": count
-                })
+            # Global statistics - status counts and the 90-day timeline from the materialized
+            # summary (refreshed by the scheduler and after bulk imports)
+            counts = fetch_warranty_counts(cur, GLOBAL_WARRANTY_COUNT_SOURCE, [], today, expiring_soon_date, ninety_days_later)
             
             # Get recent expiring warranties with user information
             days_ago_for_recent = today - timedelta(days=expiring_soon_days)
@@ -323,39 +277,7 @@ def get_global_statistics():
                 LIMIT 10
             """, (days_ago_for_recent, days_later_for_recent))
             
-            columns = [desc[0] for desc in cur.description]
-            recent_warranties = []
-            
-            for row in cur.fetchall():
-                warranty = dict(zip(columns, row))
-                
-                # Convert dates to string format
-                if warranty['purchase_date']:
-                    warranty['purchase_date'] = warranty['purchase_date'].isoformat()
-                if warranty['expiration_date']:
-                    warranty['expiration_date'] = warranty['expiration_date'].isoformat()
-                
-                # Convert Decimal objects to float for JSON serialization
-                if warranty.get('purchase_price') and isinstance(warranty['purchase_price'], Decimal):
-                    warranty['purchase_price'] = float(warranty['purchase_price'])
-                
-                # Add user display information
-                first_name = warranty.get('first_name', '').strip() if warranty.get('first_name') else ''
-                last_name = warranty.get('last_name', '').strip() if warranty.get('last_name') else ''
-                username = warranty.get('username', '').strip() if warranty.get('username') else ''
-                
-                if first_name and last_name:
-                    display_name = f"{first_name} {last_name}"
-                elif first_name:
-                    display_name = first_name
-                elif username:
-                    display_name = username
-                else:
-                    display_name = 'Unknown User'
-                
-                warranty['user_display_name'] = display_name
-                    
-                recent_warranties.append(warranty)
+            recent_warranties = [add_user_display_name(warranty) for warranty in rows_to_dicts(cur, cur.fetchall())]
             
             # Get all warranties with user information
             cur.execute("""
@@ -372,46 +294,14 @@ def get_global_statistics():
                 ORDER BY w.expiration_date DESC
             """)
 
-            all_columns = [desc[0] for desc in cur.description]
-            all_warranties_list = []
-
-            for row in cur.fetchall():
-                warranty = dict(zip(all_columns, row))
-                
-                # Convert dates to string format
-                if warranty.get('purchase_date') and isinstance(warranty['purchase_date'], date):
-                    warranty['purchase_date'] = warranty['purchase_date'].isoformat()
-                if warranty.get('expiration_date') and isinstance(warranty['expiration_date'], date):
-                    warranty['expiration_date'] = warranty['expiration_date'].isoformat()
-                
-                # Convert Decimal objects to float for JSON serialization
-                if warranty.get('purchase_price') and isinstance(warranty['purchase_price'], Decimal):
-                    warranty['purchase_price'] = float(warranty['purchase_price'])
-                
-                # Add user display name for better UI
-                first_name = warranty.get('first_name', '').strip() if warranty.get('first_name') else ''
-                last_name = warranty.get('last_name', '').strip() if warranty.get('last_name') else ''
-                username = warranty.get('username', '').strip() if warranty.get('username') else ''
-                
-                if first_name and last_name:
-                    display_name = f"{first_name} {last_name}"
-                elif first_name:
-                    display_name = first_name
-                elif username:
-                    display_name = username
-                else:
-                    display_name = 'Unknown User'
-                
-                warranty['user_display_name'] = display_name
-                    
-                all_warranties_list.append(warranty)
+            all_warranties_list = [add_user_display_name(warranty) for warranty in rows_to_dicts(cur, cur.fetchall())]
 
             statistics = {
-                'total': total_count,
-                'active': active_count,
-                'expired': expired_count,
-                'expiring_soon': expiring_soon_count,
-                'timeline': timeline,
+                'total': counts['total'],
+                'active': counts['active'],
+                'expired': counts['expired'],
+                'expiring_soon': counts['expiring_soon'],
+                'timeline': counts['timeline'],
                 'recent_warranties': recent_warranties,
                 'all_warranties': all_warranties_list
             }
@@ -431,47 +321,28 @@ def get_global_statistics():
 @token_required
 def check_global_view_status():
     """Check if global view is enabled for the current user"""
-    conn = None
     try:
         user_is_admin = request.user.get('is_admin', False)
         
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            # Check if settings table exists
-            cur.execute("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_name = 'site_settings'
-                )
-            """)
-            table_exists = cur.fetchone()[0]
-            
-            if not table_exists:
-                # If table doesn't exist, global view is enabled by default
-                return jsonify({"enabled": True}), 200
-            
-            # Get both global view settings
-            cur.execute("SELECT key, value FROM site_settings WHERE key IN ('global_view_enabled', 'global_view_admin_only')")
-            settings = {row[0]: row[1] for row in cur.fetchall()}
-            
-            # Check if global view is enabled at all
-            global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
-            if not global_view_enabled:
-                return jsonify({"enabled": False}), 200
-            
-            # Check if global view is restricted to admins only
-            admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
-            if admin_only and not user_is_admin:
-                return jsonify({"enabled": False}), 200
-            
-            # Global view is enabled for this user
-            return jsonify({"enabled": True}), 200
+        # Get both global view settings (empty if the settings table doesn't exist,
+        # in which case global view is enabled by default)
+        settings = get_site_settings()
+        
+        # Check if global view is enabled at all
+        global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
+        if not global_view_enabled:
+            return jsonify({"enabled": False}), 200
+        
+        # Check if global view is restricted to admins only
+        admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
+        if admin_only and not user_is_admin:
+            return jsonify({"enabled": False}), 200
+        
+        # Global view is enabled for this user
+        return jsonify({"enabled": True}), 200
             
     except Exception as e:
         logger.error(f"Error checking global view status: {e}")
         # Default to enabled on error for admins, disabled for non-admins
         user_is_admin = request.user.get('is_admin', False)
-        return jsonify({"enabled": user_is_admin}), 500
-    finally:
-        if conn:
-            release_db_connection(conn) 
\ No newline at end of file
+        return jsonify({"enabled": user_is_admin}), 500 
\ No newline at end of file
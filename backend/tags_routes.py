@@ -9,10 +9,20 @@ try:
     from . import db_handler
     from .auth_utils import token_required
     from .db_handler import get_db_connection, release_db_connection
+    from .change_tracking import (
+        bump_user_data_version, bump_warranty_owner_data_version, get_user_data_version,
+        user_data_etag, not_modified_response, set_etag_headers,
+        touch_warranty, touch_warranties_with_tag
+    )
 except ImportError:
     import db_handler
     from auth_utils import token_required
     from db_handler import get_db_connection, release_db_connection
+    from change_tracking import (
+        bump_user_data_version, bump_warranty_owner_data_version, get_user_data_version,
+        user_data_etag, not_modified_response, set_etag_headers,
+        touch_warranty, touch_warranties_with_tag
+    )
 
 # Create the tags blueprint
 tags_bp = Blueprint('tags_bp', __name__)
@@ -34,6 +44,11 @@ def get_tags():
         
         conn = get_db_connection()
         with conn.cursor() as cur:
+            etag = user_data_etag(user_id, get_user_data_version(cur, user_id))
+            not_modified = not_modified_response(etag)
+            if not_modified:
+                return not_modified
+
             # Fetch tags created by the currently logged-in user
             cur.execute('SELECT id, name, color, created_at FROM tags WHERE user_id = %s ORDER BY name', (user_id,))
             
@@ -49,7 +64,7 @@ def get_tags():
                     # Removed is_admin_tag comment
                 })
             
-            return jsonify(result), 200
+            return set_etag_headers(jsonify(result), etag), 200
     except Exception as e:
         logger.error(f"Error fetching tags: {e}")
         return jsonify({"error": "Failed to fetch tags"}), 500
@@ -95,6 +110,7 @@ def create_tag():
                 (name, color, user_id) # Pass user_id here
             )
             tag_id = cur.fetchone()[0]
+            bump_user_data_version(cur, user_id)
             conn.commit()
             
             return jsonify({
@@ -155,6 +171,8 @@ def update_tag(tag_id):
             cur.execute('UPDATE tags SET name = %s, color = %s, updated_at = NOW() WHERE id = %s RETURNING id, name, color', \
                         (new_name, new_color, tag_id))
             updated_tag = cur.fetchone()
+            touch_warranties_with_tag(cur, tag_id)
+            bump_user_data_version(cur, user_id)
         # conn.commit() and return statement are part of the try block, outside the 'with' block.
         conn.commit()
         return jsonify({"id": updated_tag[0], "name": updated_tag[1], "color": updated_tag[2]}), 200
@@ -190,11 +208,13 @@ def delete_tag_endpoint(tag_id):
                 return jsonify({"error": "Permission denied to delete this tag"}), 403
 
             # Delete associations from warranty_tags first
+            touch_warranties_with_tag(cur, tag_id)
             cur.execute('DELETE FROM warranty_tags WHERE tag_id = %s', (tag_id,))
             
             # Delete the tag itself
             cur.execute('DELETE FROM tags WHERE id = %s', (tag_id,))
             
+            bump_user_data_version(cur, user_id)
             conn.commit()
             
             return jsonify({"message": "Tag deleted successfully"}), 200
@@ -338,6 +358,8 @@ def add_tags_to_warranty(warranty_id):
                     params.extend([warranty_id, tag_id])
                 cur.execute(sql, params)
             
+            touch_warranty(cur, warranty_id)
+            bump_warranty_owner_data_version(cur, warranty_id)
             conn.commit()
             return jsonify({"message": "Tags updated successfully"}), 200
     except Exception as e:
@@ -0,0 +1,104 @@
+# backend/token_revocation.py
+"""
+In-memory session registry backing the stateless JWT mode (STATELESS_JWT).
+
+Stateless access tokens carry the user's claims and the id (sid) of the
+user_sessions row created at login, so token_required can authenticate them
+without querying the users table. A token is treated as revoked when its
+session is no longer live: logout and account deletion remove user_sessions
+rows, deactivated users are excluded, and expired sessions drop out.
+
+user_sessions rows are deleted rather than flagged, so the registry holds the
+(small) set of live sessions of active users and is reloaded from the database
+at most every refresh_seconds. A session unknown to this worker (e.g. created
+by a login on another worker since the last reload) triggers an early reload,
+rate limited to one per min_reload_seconds.
+"""
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SessionRegistry:
+    """Periodically reloaded set of (user_id, session_token) pairs that may still authenticate."""
+
+    def __init__(self, refresh_seconds=15, min_reload_seconds=1):
+        self.refresh_seconds = refresh_seconds
+        self.min_reload_seconds = min_reload_seconds
+        self._sessions = frozenset()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.rejections = 0
+
+    def _reload(self, get_db_connection, release_db_connection):
+        conn = None
+        try:
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT s.user_id, s.session_token
+                    FROM user_sessions s
+                    JOIN users u ON u.id = s.user_id
+                    WHERE u.is_active = TRUE AND s.expires_at > NOW()
+                """)
+                sessions = frozenset((str(user_id), session_token) for user_id, session_token in cur.fetchall())
+            conn.rollback() # End the read transaction (the connection may be request-scoped)
+            self._sessions = sessions
+            self.reloads += 1
+        except Exception as e:
+            # Keep the previous snapshot; tokens unknown to it are rejected
+            logger.error(f"Error reloading session registry: {e}")
+            if conn:
+                conn.rollback()
+        finally:
+            self._loaded_at = time.monotonic()
+            if conn:
+                release_db_connection(conn)
+
+    def _reload_if_older_than(self, max_age, get_db_connection, release_db_connection):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= max_age:
+                self._reload(get_db_connection, release_db_connection)
+
+    def is_live(self, user_id, session_token, get_db_connection, release_db_connection):
+        """Return True if the session may still authenticate, reloading the snapshot when stale or on a miss."""
+        if not session_token:
+            return False
+        key = (str(user_id), session_token)
+        self._reload_if_older_than(self.refresh_seconds, get_db_connection, release_db_connection)
+        if key in self._sessions:
+            return True
+        self._reload_if_older_than(self.min_reload_seconds, get_db_connection, release_db_connection)
+        if key in self._sessions:
+            return True
+        self.rejections += 1
+        return False
+
+    def revoke_user(self, user_id):
+        """Drop a user's sessions from this worker's snapshot immediately (logout, deactivation, deletion)."""
+        user_id = str(user_id)
+        with self._lock:
+            self._sessions = frozenset(key for key in self._sessions if key[0] != user_id)
+
+    def stats(self):
+        return {
+            'live_sessions': len(self._sessions),
+            'refresh_seconds': self.refresh_seconds,
+            'reloads': self.reloads,
+            'rejections': self.rejections,
+            'pid': os.getpid()
+        }
+
+def _int_from_env(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"{name} is not a valid integer, using {default}")
+        return default
+
+session_registry = SessionRegistry(
+    refresh_seconds=_int_from_env('STATELESS_JWT_REVOCATION_REFRESH_SECONDS', 15)
+)
@@ -0,0 +1,93 @@
+# backend/user_cache.py
+"""
+Short-lived per-worker cache of the user record resolved by token_required.
+
+Entries expire after AUTH_USER_CACHE_TTL_SECONDS, which bounds how long another
+worker can keep serving a user that was modified, demoted or deactivated there.
+Code that changes a user's identity, role or active state in this worker calls
+invalidate() after committing so the change applies immediately here.
+"""
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class UserCache:
+    """Thread-safe LRU cache of authenticated-user dicts keyed by user id, with a per-entry TTL."""
+
+    def __init__(self, max_entries=1024, ttl_seconds=30):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        """Return a copy of the cached user dict, or None on a miss or expired entry."""
+        if self.ttl_seconds <= 0:
+            return None
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(user)
+
+    def set(self, user_id, user):
+        if self.ttl_seconds <= 0:
+            return
+        key = str(user_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(user))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                if self._entries.pop(str(user_id), None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+                'pid': os.getpid()
+            }
+
+def _int_from_env(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"{name} is not a valid integer, using {default}")
+        return default
+
+user_cache = UserCache(
+    max_entries=_int_from_env('AUTH_USER_CACHE_MAX_ENTRIES', 1024),
+    ttl_seconds=_int_from_env('AUTH_USER_CACHE_TTL_SECONDS', 30)
+)
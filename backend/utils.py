@@ -6,4 +6,37 @@ Shared utility functions for the Warracker application
 def allowed_file(filename):
     """Check if the file extension is allowed"""
     ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'zip', 'rar', 'webp', 'gif'}
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS 
\ No newline at end of file
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS 
+
+def add_user_display_name(warranty_dict):
+    """Set user_display_name from the owner's first/last name or username."""
+    first_name = warranty_dict.get('first_name', '').strip() if warranty_dict.get('first_name') else ''
+    last_name = warranty_dict.get('last_name', '').strip() if warranty_dict.get('last_name') else ''
+    username = warranty_dict.get('username', '').strip() if warranty_dict.get('username') else ''
+
+    if first_name and last_name:
+        warranty_dict['user_display_name'] = f"{first_name} {last_name}"
+    elif first_name:
+        warranty_dict['user_display_name'] = first_name
+    elif username:
+        warranty_dict['user_display_name'] = username
+    else:
+        warranty_dict['user_display_name'] = 'Unknown User'
+    return warranty_dict
+
+def parse_fields_param(value, allowed_fields):
+    """Parse a comma-separated ?fields= projection against a whitelist.
+
+    Returns None when no projection was requested, otherwise the requested
+    field names (deduplicated, in request order). Raises ValueError for an
+    empty list or unknown field names.
+    """
+    if value is None:
+        return None
+    fields = list(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    if not fields:
+        raise ValueError("fields must list at least one field")
+    unknown = [field for field in fields if field not in allowed_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
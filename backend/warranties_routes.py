@@ -1,12 +1,13 @@
 # backend/warranties_routes.py
 from flask import Blueprint, request, jsonify, current_app, send_from_directory
 from werkzeug.utils import secure_filename
-from datetime import datetime, date
-from decimal import Decimal
+from datetime import datetime, date, timedelta
 import os
 import json
+import base64
 import csv
 import io
+from itertools import islice
 from dateutil.relativedelta import relativedelta
 from dateutil.parser import parse as date_parse
 import mimetypes
@@ -17,16 +18,30 @@ import pytz
 
 # Use relative imports for project modules
 try:
-    from .db_handler import get_db_connection, release_db_connection
+    from .db_handler import get_db_connection, release_db_connection, detach_request_connection, refresh_global_statistics, get_site_settings
     from .auth_utils import token_required, admin_required
     from .paperless_handler import get_paperless_handler
-    from .utils import allowed_file
+    from .utils import allowed_file, add_user_display_name, parse_fields_param
+    from .serialization import rows_to_dicts, row_to_dict
+    from .change_tracking import (
+        bump_user_data_version, bump_warranty_owner_data_version, get_user_data_version,
+        user_data_etag, not_modified_response, set_etag_headers,
+        touch_warranty, current_sync_point, encode_sync_token, decode_sync_token,
+        SYNC_TOMBSTONE_RETENTION_DAYS
+    )
 except ImportError:
     # Fallback for development environment
-    from db_handler import get_db_connection, release_db_connection
+    from db_handler import get_db_connection, release_db_connection, detach_request_connection, refresh_global_statistics, get_site_settings
     from auth_utils import token_required, admin_required
     from paperless_handler import get_paperless_handler
-    from utils import allowed_file
+    from utils import allowed_file, add_user_display_name, parse_fields_param
+    from serialization import rows_to_dicts, row_to_dict
+    from change_tracking import (
+        bump_user_data_version, bump_warranty_owner_data_version, get_user_data_version,
+        user_data_etag, not_modified_response, set_etag_headers,
+        touch_warranty, current_sync_point, encode_sync_token, decode_sync_token,
+        SYNC_TOMBSTONE_RETENTION_DAYS
+    )
 
 import logging
 logger = logging.getLogger(__name__)
@@ -35,83 +50,361 @@ warranties_bp = Blueprint('warranties_bp', __name__)
 
 
 
-def convert_decimals(obj):
-    """Recursively convert Decimal objects to float in dicts/lists for JSON serialization."""
-    if isinstance(obj, dict):
-        return {k: convert_decimals(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_decimals(i) for i in obj]
-    elif isinstance(obj, Decimal):
-        return float(obj)
-    else:
-        return obj
+# Fields of the personal warranty list payload, selectable with ?fields=.
+# serial_numbers and tags are attached after the main query.
+WARRANTY_LIST_COLUMNS = (
+    'id', 'product_name', 'purchase_date', 'expiration_date', 'invoice_path', 'manual_path', 'other_document_path',
+    'product_url', 'notes', 'purchase_price', 'user_id', 'created_at', 'updated_at', 'is_lifetime', 'vendor',
+    'warranty_type', 'warranty_duration_years', 'warranty_duration_months', 'warranty_duration_days',
+    'product_photo_path', 'currency', 'paperless_invoice_id', 'paperless_manual_id', 'paperless_photo_id',
+    'paperless_other_id', 'invoice_url', 'manual_url', 'other_document_url', 'model_number', 'claim_status_summary'
+)
+WARRANTY_LIST_FIELDS = WARRANTY_LIST_COLUMNS + ('serial_numbers', 'tags')
+
+def parse_warranty_list_fields(args):
+    """Return the requested ?fields= for a warranty list (id always included), or None for all fields.
+
+    Raises ValueError for unknown fields.
+    """
+    fields = parse_fields_param(args.get('fields'), WARRANTY_LIST_FIELDS)
+    if fields is None:
+        return None
+    return list(dict.fromkeys(['id'] + fields))
+
+def warranty_list_select(fields=None):
+    """Build the SELECT list of a personal warranty list query for the given fields (all when None)."""
+    fields = fields or WARRANTY_LIST_FIELDS
+    return ', '.join(f'w.{field}' for field in WARRANTY_LIST_COLUMNS if field in fields)
+
+def attach_serials_and_tags(cur, warranties_list, include_serials=True, include_tags=True):
+    """Attach serial_numbers and tags to each warranty dict using two batched queries.
+
+    Replaces the previous per-row lookups so list endpoints issue a constant number
+    of queries regardless of how many warranties are returned.
+    """
+    if not warranties_list or not (include_serials or include_tags):
+        return warranties_list
+
+    warranty_ids = [w['id'] for w in warranties_list]
+    serials_by_warranty = {warranty_id: [] for warranty_id in warranty_ids}
+    tags_by_warranty = {warranty_id: [] for warranty_id in warranty_ids}
+
+    if include_serials:
+        cur.execute(
+            'SELECT warranty_id, serial_number FROM serial_numbers WHERE warranty_id = ANY(%s) ORDER BY id',
+            (warranty_ids,)
+        )
+        for warranty_id, serial_number in cur.fetchall():
+            serials_by_warranty[warranty_id].append(serial_number)
+
+    if include_tags:
+        cur.execute('''
+            SELECT wt.warranty_id, t.id, t.name, t.color
+            FROM tags t
+            JOIN warranty_tags wt ON t.id = wt.tag_id
+            WHERE wt.warranty_id = ANY(%s)
+            ORDER BY t.name
+        ''', (warranty_ids,))
+        for warranty_id, tag_id, tag_name, tag_color in cur.fetchall():
+            tags_by_warranty[warranty_id].append({'id': tag_id, 'name': tag_name, 'color': tag_color})
+
+    for warranty_dict in warranties_list:
+        if include_serials:
+            warranty_dict['serial_numbers'] = serials_by_warranty[warranty_dict['id']]
+        if include_tags:
+            warranty_dict['tags'] = tags_by_warranty[warranty_dict['id']]
+
+    return warranties_list
+
+def fetch_warranty_list_json(cur, list_query, params=None, include_serials=True, include_tags=True):
+    """Run a warranty list query and let PostgreSQL build the JSON array.
+
+    list_query is one of the ordered list SELECTs (it must expose w.id as id).
+    Serial numbers and tags are nested per row in the same shape as
+    attach_serials_and_tags, and the result comes back as text so it can be sent
+    without being decoded and re-encoded in Python. Used when DB_JSON_LISTS is on.
+    """
+    nested = ['(b.w).*']
+    if include_serials:
+        nested.append('''COALESCE((
+                    SELECT json_agg(s.serial_number ORDER BY s.id)
+                    FROM serial_numbers s
+                    WHERE s.warranty_id = (b.w).id
+                ), '[]'::json) AS serial_numbers''')
+    if include_tags:
+        nested.append('''COALESCE((
+                    SELECT json_agg(json_build_object('id', t.id, 'name', t.name, 'color', t.color) ORDER BY t.name)
+                    FROM tags t
+                    JOIN warranty_tags wt ON t.id = wt.tag_id
+                    WHERE wt.warranty_id = (b.w).id
+                ), '[]'::json) AS tags''')
+
+    # Row order is captured with row_number() and applied by the aggregate itself:
+    # PostgreSQL does not guarantee that an aggregate sees a subquery's rows in order.
+    # w is the whole list row, so rn stays out of the JSON objects.
+    cur.execute(f'''
+        SELECT COALESCE(json_agg(l ORDER BY b.rn), '[]'::json)::text
+        FROM (
+            SELECT row_number() OVER () AS rn, q AS w
+            FROM ({list_query}) q
+        ) b
+        CROSS JOIN LATERAL (
+            SELECT {', '.join(nested)}
+        ) l
+    ''', params)
+    return cur.fetchone()[0]
+
+# Global and admin views span every user's warranties, so they are streamed from a
+# server-side cursor in chunks instead of being materialised in memory at once.
+WARRANTY_STREAM_ITERSIZE = 500
+
+def stream_warranty_list(conn, cursor_name, query, params=None):
+    """Run a warranty list query on a named cursor and stream it as a JSON array.
+
+    The query and the first chunk are executed before returning, so database
+    errors still surface to the caller's error handling. The returned response
+    takes ownership of conn (detaching it from the request scope, since the body
+    is produced after teardown) and releases it once the response is closed.
+    """
+    named_cur = conn.cursor(name=cursor_name)
+    named_cur.itersize = WARRANTY_STREAM_ITERSIZE
+    named_cur.execute(query, params)
+    rows = iter(named_cur)
+    first_chunk = list(islice(rows, WARRANTY_STREAM_ITERSIZE))
+    dumps = current_app.json.dumps
+
+    def encode_chunk(chunk):
+        warranties_list = [add_user_display_name(warranty_dict) for warranty_dict in rows_to_dicts(named_cur, chunk)]
+        with conn.cursor() as cur:
+            attach_serials_and_tags(cur, warranties_list)
+        return ','.join(dumps(warranty_dict) for warranty_dict in warranties_list)
+
+    def generate():
+        try:
+            yield '['
+            chunk = first_chunk
+            separator = ''
+            while chunk:
+                yield separator + encode_chunk(chunk)
+                separator = ','
+                chunk = list(islice(rows, WARRANTY_STREAM_ITERSIZE))
+            yield ']'
+        except Exception as e:
+            # Headers are already sent; log and end the (truncated) body
+            logger.error(f"Error while streaming {cursor_name}: {e}")
+        finally:
+            try:
+                named_cur.close()
+            except Exception:
+                pass
+
+    response = Response(generate(), mimetype='application/json')
+    detach_request_connection(conn)
+    response.call_on_close(lambda: release_db_connection(conn))
+    return response
+
+# Keyset pagination and server-side filtering for GET /warranties (opt-in via query params)
+DEFAULT_WARRANTY_PAGE_SIZE = 50
+MAX_WARRANTY_PAGE_SIZE = 200
+WARRANTY_STATUS_FILTERS = ('active', 'expiring', 'expired')
+CLAIM_STATUS_FILTERS = ('NO_CLAIMS', 'OPEN', 'FINISHED')
+
+# Sort key shared by ORDER BY and the keyset comparison. COALESCE to 'infinity'
+# matches the NULLS LAST ordering of expiration_date, and w.id breaks ties.
+WARRANTY_LIST_SORT_KEY = "(CASE WHEN w.is_lifetime THEN 1 ELSE 0 END), COALESCE(w.expiration_date, 'infinity'::date), w.product_name, w.id"
+# Fields encode_list_cursor reads from the last row of a page
+WARRANTY_CURSOR_FIELDS = ('id', 'is_lifetime', 'expiration_date', 'product_name')
+
+def encode_list_cursor(warranty_dict):
+    """Encode the sort key of the last returned warranty as an opaque cursor."""
+    key = [
+        1 if warranty_dict.get('is_lifetime') else 0,
+        warranty_dict.get('expiration_date') or 'infinity',
+        warranty_dict.get('product_name'),
+        warranty_dict.get('id')
+    ]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+def decode_list_cursor(cursor):
+    """Decode a cursor produced by encode_list_cursor. Raises ValueError when malformed."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != 4:
+        raise ValueError("Invalid cursor")
+    lifetime_rank, expiration_date, product_name, warranty_id = key
+    if lifetime_rank not in (0, 1) or not isinstance(warranty_id, int) or not isinstance(expiration_date, str):
+        raise ValueError("Invalid cursor")
+    if expiration_date != 'infinity':
+        try:
+            datetime.strptime(expiration_date, '%Y-%m-%d')
+        except ValueError:
+            raise ValueError("Invalid cursor")
+    return lifetime_rank, expiration_date, product_name, warranty_id
+
+def build_warranty_list_filters(cur, user_id, args):
+    """Translate list query parameters into SQL conditions and parameters.
+
+    Supports tag (repeatable tag id), vendor, warranty_type, status
+    (active/expiring/expired, same buckets as the dashboard) and claim_status.
+    Raises ValueError for invalid values.
+    """
+    conditions = []
+    params = []
+
+    tag_values = args.getlist('tag')
+    if tag_values:
+        try:
+            tag_ids = [int(tag) for tag in tag_values]
+        except ValueError:
+            raise ValueError("tag must be a tag ID")
+        conditions.append('EXISTS (SELECT 1 FROM warranty_tags wt WHERE wt.warranty_id = w.id AND wt.tag_id = ANY(%s))')
+        params.append(tag_ids)
+
+    vendor = args.get('vendor')
+    if vendor:
+        conditions.append('LOWER(w.vendor) = LOWER(%s)')
+        params.append(vendor)
+
+    warranty_type = args.get('warranty_type')
+    if warranty_type:
+        conditions.append('LOWER(w.warranty_type) = LOWER(%s)')
+        params.append(warranty_type)
+
+    status = args.get('status')
+    if status:
+        if status not in WARRANTY_STATUS_FILTERS:
+            raise ValueError(f"status must be one of: {', '.join(WARRANTY_STATUS_FILTERS)}")
+        today = date.today()
+        if status == 'expired':
+            conditions.append('w.is_lifetime = FALSE AND w.expiration_date < %s')
+            params.append(today)
+        else:
+            expiring_soon_days = 30
+            cur.execute("SELECT expiring_soon_days FROM user_preferences WHERE user_id = %s", (user_id,))
+            result = cur.fetchone()
+            if result and result[0] is not None:
+                expiring_soon_days = result[0]
+            expiring_soon_date = today + relativedelta(days=expiring_soon_days)
+            if status == 'expiring':
+                conditions.append('w.is_lifetime = FALSE AND w.expiration_date >= %s AND w.expiration_date < %s')
+                params.extend([today, expiring_soon_date])
+            else:
+                conditions.append('(w.is_lifetime = TRUE OR w.expiration_date >= %s)')
+                params.append(expiring_soon_date)
+
+    claim_status = args.get('claim_status')
+    if claim_status:
+        claim_status = claim_status.upper()
+        if claim_status not in CLAIM_STATUS_FILTERS:
+            raise ValueError(f"claim_status must be one of: {', '.join(CLAIM_STATUS_FILTERS)}")
+        conditions.append('w.claim_status_summary = %s')
+        params.append(claim_status)
+
+    return conditions, params
 
 @warranties_bp.route('/warranties', methods=['GET'])
 @token_required
 def get_warranties():
+    """Get the user's active warranties.
+
+    Without query parameters the full list is returned as before. Passing
+    limit and/or cursor switches to keyset pagination and returns
+    {"warranties": [...], "next_cursor": ...}; filter parameters (see
+    build_warranty_list_filters) and a ?fields= projection can be used in
+    either mode.
+    """
     conn = None
     try:
         user_id = request.user['id']
-        # is_admin = request.user.get('is_admin', False) # Removed admin check
+
+        paginate = 'limit' in request.args or 'cursor' in request.args
+        page_size = DEFAULT_WARRANTY_PAGE_SIZE
+        cursor_key = None
+        if paginate:
+            try:
+                page_size = int(request.args.get('limit', DEFAULT_WARRANTY_PAGE_SIZE))
+            except ValueError:
+                return jsonify({"error": "limit must be a number"}), 400
+            if page_size < 1 or page_size > MAX_WARRANTY_PAGE_SIZE:
+                return jsonify({"error": f"limit must be between 1 and {MAX_WARRANTY_PAGE_SIZE}"}), 400
+            if request.args.get('cursor'):
+                try:
+                    cursor_key = decode_list_cursor(request.args['cursor'])
+                except ValueError as e:
+                    return jsonify({"error": str(e)}), 400
+
+        try:
+            fields = parse_warranty_list_fields(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        select_fields = fields
+        if fields is not None and paginate:
+            # next_cursor is built from the sort key columns, select them even if not requested
+            select_fields = list(dict.fromkeys(fields + list(WARRANTY_CURSOR_FIELDS)))
 
         conn = get_db_connection()
         with conn.cursor() as cur:
-            # Always fetch warranties belonging to the logged-in user
-            # Removed the if is_admin: block
-            # Replaced warranty_years with warranty_duration_years, warranty_duration_months, warranty_duration_days
-            cur.execute('''
-                SELECT 
-                    w.id, w.product_name, w.purchase_date, w.expiration_date, w.invoice_path, w.manual_path, w.other_document_path, w.product_url, w.notes,
-                    w.purchase_price, w.user_id, w.created_at, w.updated_at, w.is_lifetime, w.vendor, w.warranty_type,
-                    w.warranty_duration_years, w.warranty_duration_months, w.warranty_duration_days, w.product_photo_path, w.currency,
-                    w.paperless_invoice_id, w.paperless_manual_id, w.paperless_photo_id, w.paperless_other_id,
-                    w.invoice_url, w.manual_url, w.other_document_url, w.model_number,
-                    CASE
-                        WHEN COUNT(c.id) = 0 THEN 'NO_CLAIMS'
-                        WHEN BOOL_OR(c.status IN ('Submitted', 'In Progress')) THEN 'OPEN'
-                        ELSE 'FINISHED'
-                    END AS claim_status_summary
+            etag = user_data_etag(user_id, get_user_data_version(cur, user_id), ','.join(fields or ['all']))
+            not_modified = not_modified_response(etag)
+            if not_modified:
+                return not_modified
+
+            try:
+                conditions, params = build_warranty_list_filters(cur, user_id, request.args)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            where_clauses = ['w.user_id = %s', 'w.archived_at IS NULL'] + conditions
+            query_params = [user_id] + params
+            if cursor_key is not None:
+                where_clauses.append(f"({WARRANTY_LIST_SORT_KEY}) > (%s, %s::date, %s, %s)")
+                query_params.extend(cursor_key)
+            limit_clause = ''
+            if paginate:
+                # Fetch one extra row to know whether another page exists
+                limit_clause = 'LIMIT %s'
+                query_params.append(page_size + 1)
+
+            list_query = f'''
+                SELECT {warranty_list_select(select_fields)}
                 FROM warranties w
-                LEFT JOIN warranty_claims c ON w.id = c.warranty_id
-                WHERE w.user_id = %s AND w.archived_at IS NULL
-                GROUP BY w.id
-                ORDER BY CASE WHEN w.is_lifetime THEN 1 ELSE 0 END, w.expiration_date NULLS LAST, w.product_name
-            ''', (user_id,))
-                
+                WHERE {' AND '.join(where_clauses)}
+                ORDER BY {WARRANTY_LIST_SORT_KEY}
+                {limit_clause}
+            '''
+
+            include_serials = fields is None or 'serial_numbers' in fields
+            include_tags = fields is None or 'tags' in fields
+
+            if current_app.config.get('DB_JSON_LISTS') and not paginate:
+                warranties_json = fetch_warranty_list_json(cur, list_query, query_params, include_serials, include_tags)
+                return set_etag_headers(Response(warranties_json, mimetype='application/json'), etag)
+
+            cur.execute(list_query, query_params)
+
             warranties = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
-            warranties_list = []
-            
-            for row in warranties:
-                warranty_dict = dict(zip(columns, row))
-                # Convert date objects to ISO format strings for JSON serialization
-                for key, value in warranty_dict.items():
-                    if isinstance(value, (datetime, date)):
-                        warranty_dict[key] = value.isoformat()
-                    # Convert Decimal objects to float for JSON serialization
-                    elif isinstance(value, Decimal):
-                        warranty_dict[key] = float(value)
-                
-                # Get serial numbers for this warranty
-                warranty_id = warranty_dict['id']
-                cur.execute('SELECT serial_number FROM serial_numbers WHERE warranty_id = %s', (warranty_id,))
-                serial_numbers = [row[0] for row in cur.fetchall()]
-                warranty_dict['serial_numbers'] = serial_numbers
-                
-                # Get tags for this warranty (show all associated tags the user can see via warranty access)
-                cur.execute('''
-                    SELECT t.id, t.name, t.color
-                    FROM tags t
-                    JOIN warranty_tags wt ON t.id = wt.tag_id
-                    WHERE wt.warranty_id = %s -- Removed user_id/is_admin filter here
-                    ORDER BY t.name
-                ''', (warranty_id,))
-                tags = [{'id': t[0], 'name': t[1], 'color': t[2]} for t in cur.fetchall()]
-                warranty_dict['tags'] = tags
-                
-                warranties_list.append(warranty_dict)
-                
-            return jsonify(warranties_list)
+
+            has_more = paginate and len(warranties) > page_size
+            if has_more:
+                warranties = warranties[:page_size]
+
+            warranties_list = rows_to_dicts(cur, warranties)
+            attach_serials_and_tags(cur, warranties_list, include_serials, include_tags)
+
+            if paginate:
+                next_cursor = encode_list_cursor(warranties_list[-1]) if has_more else None
+                if select_fields != fields:
+                    extra_fields = [field for field in select_fields if field not in fields]
+                    for warranty_dict in warranties_list:
+                        for field in extra_fields:
+                            del warranty_dict[field]
+                return set_etag_headers(jsonify({
+                    'warranties': warranties_list,
+                    'next_cursor': next_cursor
+                }), etag)
+            return set_etag_headers(jsonify(warranties_list), etag)
     except Exception as e:
         current_app.logger.error(f"Error retrieving warranties: {e}")
         return jsonify({"error": "Failed to retrieve warranties"}), 500
@@ -126,57 +419,38 @@ def get_archived_warranties():
     try:
         user_id = request.user['id']
 
+        try:
+            fields = parse_warranty_list_fields(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        select_fields = fields
+
         conn = get_db_connection()
         with conn.cursor() as cur:
-            cur.execute('''
-                SELECT 
-                    w.id, w.product_name, w.purchase_date, w.expiration_date, w.invoice_path, w.manual_path, w.other_document_path, w.product_url, w.notes,
-                    w.purchase_price, w.user_id, w.created_at, w.updated_at, w.is_lifetime, w.vendor, w.warranty_type,
-                    w.warranty_duration_years, w.warranty_duration_months, w.warranty_duration_days, w.product_photo_path, w.currency,
-                    w.paperless_invoice_id, w.paperless_manual_id, w.paperless_photo_id, w.paperless_other_id,
-                    w.invoice_url, w.manual_url, w.other_document_url, w.model_number,
-                    CASE
-                        WHEN COUNT(c.id) = 0 THEN 'NO_CLAIMS'
-                        WHEN BOOL_OR(c.status IN ('Submitted', 'In Progress')) THEN 'OPEN'
-                        ELSE 'FINISHED'
-                    END AS claim_status_summary
+            etag = user_data_etag(user_id, get_user_data_version(cur, user_id), ','.join(fields or ['all']))
+            not_modified = not_modified_response(etag)
+            if not_modified:
+                return not_modified
+
+            list_query = f'''
+                SELECT {warranty_list_select(select_fields)}
                 FROM warranties w
-                LEFT JOIN warranty_claims c ON w.id = c.warranty_id
                 WHERE w.user_id = %s AND w.archived_at IS NOT NULL
-                GROUP BY w.id
                 ORDER BY w.archived_at DESC NULLS LAST, w.updated_at DESC NULLS LAST, w.product_name
-            ''', (user_id,))
+            '''
 
-            warranties = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
-            warranties_list = []
-
-            for row in warranties:
-                warranty_dict = dict(zip(columns, row))
-                for key, value in warranty_dict.items():
-                    if isinstance(value, (datetime, date)):
-                        warranty_dict[key] = value.isoformat()
-                    elif isinstance(value, Decimal):
-                        warranty_dict[key] = float(value)
-
-                warranty_id = warranty_dict['id']
-                cur.execute('SELECT serial_number FROM serial_numbers WHERE warranty_id = %s', (warranty_id,))
-                serial_numbers = [row[0] for row in cur.fetchall()]
-                warranty_dict['serial_numbers'] = serial_numbers
+            include_serials = fields is None or 'serial_numbers' in fields
+            include_tags = fields is None or 'tags' in fields
 
-                cur.execute('''
-                    SELECT t.id, t.name, t.color
-                    FROM tags t
-                    JOIN warranty_tags wt ON t.id = wt.tag_id
-                    WHERE wt.warranty_id = %s
-                    ORDER BY t.name
-                ''', (warranty_id,))
-                tags = [{'id': t[0], 'name': t[1], 'color': t[2]} for t in cur.fetchall()]
-                warranty_dict['tags'] = tags
+            if current_app.config.get('DB_JSON_LISTS'):
+                warranties_json = fetch_warranty_list_json(cur, list_query, (user_id,), include_serials, include_tags)
+                return set_etag_headers(Response(warranties_json, mimetype='application/json'), etag)
 
-                warranties_list.append(warranty_dict)
+            cur.execute(list_query, (user_id,))
 
-            return jsonify(warranties_list)
+            warranties_list = rows_to_dicts(cur, cur.fetchall())
+            attach_serials_and_tags(cur, warranties_list, include_serials, include_tags)
+            return set_etag_headers(jsonify(warranties_list), etag)
     except Exception as e:
         current_app.logger.error(f"Error retrieving archived warranties: {e}")
         return jsonify({"error": "Failed to retrieve archived warranties"}), 500
@@ -184,6 +458,87 @@ def get_archived_warranties():
         if conn:
             release_db_connection(conn)
 
+@warranties_bp.route('/warranties/changes', methods=['GET'])
+@token_required
+def get_warranty_changes():
+    """Delta sync for the user's warranties.
+
+    GET /warranties/changes?since=<token> returns the active warranties created or
+    changed since the token (same shape as GET /warranties) plus "removed"
+    tombstones for warranties deleted or archived since then, and a next_token
+    to use on the following call. Without a token, or with one older than the
+    tombstone retention window, the full active list is returned with
+    "full_resync": true and the client should replace its local copy.
+    """
+    conn = None
+    try:
+        user_id = request.user['id']
+
+        since = None
+        if request.args.get('since'):
+            try:
+                since = decode_sync_token(request.args['since'])
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        full_resync = since is None or since < datetime.now(pytz.utc) - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+        if full_resync:
+            since = None
+
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            # Capture the next token before reading so nothing committed in between is lost;
+            # overlapping rows are simply sent again and clients upsert by id.
+            next_token = encode_sync_token(current_sync_point(cur))
+
+            where_clauses = ['w.user_id = %s', 'w.archived_at IS NULL']
+            query_params = [user_id]
+            if since is not None:
+                where_clauses.append('w.updated_at >= %s')
+                query_params.append(since)
+
+            cur.execute(f'''
+                SELECT {warranty_list_select()}
+                FROM warranties w
+                WHERE {' AND '.join(where_clauses)}
+                ORDER BY w.updated_at, w.id
+            ''', query_params)
+
+            warranties_list = rows_to_dicts(cur, cur.fetchall())
+            attach_serials_and_tags(cur, warranties_list)
+
+            removed = []
+            if since is not None:
+                cur.execute('''
+                    SELECT id, 'archived' AS reason, archived_at AS removed_at
+                    FROM warranties
+                    WHERE user_id = %s AND archived_at >= %s
+                    UNION ALL
+                    SELECT warranty_id, 'deleted', deleted_at
+                    FROM warranty_deletions
+                    WHERE user_id = %s AND deleted_at >= %s
+                    ORDER BY removed_at
+                ''', (user_id, since, user_id, since))
+                removed = [
+                    {'id': row[0], 'reason': row[1], 'removed_at': row[2].isoformat() if row[2] else None}
+                    for row in cur.fetchall()
+                ]
+
+            response = jsonify({
+                'warranties': warranties_list,
+                'removed': removed,
+                'next_token': next_token,
+                'full_resync': full_resync
+            })
+            response.headers['Cache-Control'] = 'private, no-store'
+            return response
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving warranty changes: {e}")
+        return jsonify({"error": "Failed to retrieve warranty changes"}), 500
+    finally:
+        if conn:
+            release_db_connection(conn)
+
 @warranties_bp.route('/warranties', methods=['POST'])
 @token_required
 def add_warranty():
@@ -476,6 +831,7 @@ def add_warranty():
                     else:
                         logger.warning(f"Skipping non-existent tag ID: {tag_id}")
             
+            bump_user_data_version(cur, user_id)
             conn.commit()
             
         return jsonify({
@@ -522,6 +878,7 @@ def toggle_archive_warranty(warranty_id):
             else:
                 cur.execute('UPDATE warranties SET archived_at = NULL, updated_at = NOW() WHERE id = %s', (warranty_id,))
 
+            bump_warranty_owner_data_version(cur, warranty_id)
             conn.commit()
 
         return jsonify({"message": "Archive status updated", "archived": bool(archived_flag)})
@@ -564,6 +921,9 @@ def delete_warranty(warranty_id):
             other_document_path = result[2]
             product_photo_path = result[3]
             
+            # Bump the owner's data version while the warranty row still exists
+            bump_warranty_owner_data_version(cur, warranty_id)
+
             # Delete the warranty from database
             cur.execute('DELETE FROM warranties WHERE id = %s', (warranty_id,))
             deleted_rows = cur.rowcount
@@ -628,6 +988,7 @@ def update_warranty(warranty_id):
             if request.is_json and 'notes' in request.json and len(request.json) == 1:
                 notes = request.json.get('notes', None)
                 cur.execute("UPDATE warranties SET notes = %s, updated_at = NOW() WHERE id = %s", (notes, warranty_id))
+                bump_warranty_owner_data_version(cur, warranty_id)
                 conn.commit()
                 return jsonify({"message": "Notes updated successfully"}), 200
 
@@ -1100,6 +1461,7 @@ def update_warranty(warranty_id):
                     else:
                         logger.warning(f"Skipping non-existent tag ID: {tag_id}")
             
+            bump_warranty_owner_data_version(cur, warranty_id)
             conn.commit()
             
             return jsonify({"message": "Warranty updated successfully"}), 200
@@ -1432,7 +1794,9 @@ def import_warranties():
             # --- Transaction Commit/Rollback --- 
             if imported_count > 0 and failed_rows:
                 # Partial success: commit successful rows and return 200 with error details for failed rows
+                bump_user_data_version(cur, user_id)
                 conn.commit()
+                refresh_global_statistics()
                 final_success_count = imported_count
                 final_failure_count = len(failed_rows)
                 return jsonify({
@@ -1454,7 +1818,12 @@ def import_warranties():
                 }), 400
             else:
                 # All rows succeeded
+                if imported_count > 0:
+                    bump_user_data_version(cur, user_id)
                 conn.commit()
+                if imported_count > 0:
+                    # Bulk write: bring the materialized global statistics up to date right away
+                    refresh_global_statistics()
                 final_success_count = imported_count
                 final_failure_count = len(failed_rows)
 
@@ -1482,77 +1851,25 @@ def get_all_warranties():
     conn = None
     try:
         conn = get_db_connection()
-        with conn.cursor() as cur:
-            # Get all warranties from all users with user information (exclude archived by default)
-            cur.execute('''
-                SELECT 
-                    w.id, w.product_name, w.purchase_date, w.expiration_date, w.invoice_path, w.manual_path, w.other_document_path, 
-                    w.product_url, w.notes, w.purchase_price, w.user_id, w.created_at, w.updated_at, w.is_lifetime, 
-                    w.vendor, w.warranty_type, w.warranty_duration_years, w.warranty_duration_months, w.warranty_duration_days, w.product_photo_path, w.currency,
-                    w.paperless_invoice_id, w.paperless_manual_id, w.paperless_photo_id, w.paperless_other_id,
-                    w.invoice_url, w.manual_url, w.other_document_url,
-                    u.username, u.email, u.first_name, u.last_name,
-                    CASE
-                        WHEN COUNT(c.id) = 0 THEN 'NO_CLAIMS'
-                        WHEN BOOL_OR(c.status IN ('Submitted', 'In Progress')) THEN 'OPEN'
-                        ELSE 'FINISHED'
-                    END AS claim_status_summary
-                FROM warranties w
-                JOIN users u ON w.user_id = u.id
-                LEFT JOIN warranty_claims c ON w.id = c.warranty_id
-                WHERE w.archived_at IS NULL
-                GROUP BY w.id, u.id
-                ORDER BY u.username, CASE WHEN w.is_lifetime THEN 1 ELSE 0 END, w.expiration_date NULLS LAST, w.product_name
-            ''')
-                
-            warranties = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
-            warranties_list = []
-            
-            for row in warranties:
-                warranty_dict = dict(zip(columns, row))
-                # Convert date objects to ISO format strings for JSON serialization
-                for key, value in warranty_dict.items():
-                    if isinstance(value, (datetime, date)):
-                        warranty_dict[key] = value.isoformat()
-                    # Convert Decimal objects to float for JSON serialization
-                    elif isinstance(value, Decimal):
-                        warranty_dict[key] = float(value)
-                
-                # Get serial numbers for this warranty
-                warranty_id = warranty_dict['id']
-                cur.execute('SELECT serial_number FROM serial_numbers WHERE warranty_id = %s', (warranty_id,))
-                serial_numbers = [row[0] for row in cur.fetchall()]
-                warranty_dict['serial_numbers'] = serial_numbers
-                
-                # Get tags for this warranty
-                cur.execute('''
-                    SELECT t.id, t.name, t.color
-                    FROM tags t
-                    JOIN warranty_tags wt ON t.id = wt.tag_id
-                    WHERE wt.warranty_id = %s
-                    ORDER BY t.name
-                ''', (warranty_id,))
-                tags = [{'id': t[0], 'name': t[1], 'color': t[2]} for t in cur.fetchall()]
-                warranty_dict['tags'] = tags
-                
-                # Add user display name for better UI
-                first_name = warranty_dict.get('first_name', '').strip() if warranty_dict.get('first_name') else ''
-                last_name = warranty_dict.get('last_name', '').strip() if warranty_dict.get('last_name') else ''
-                username = warranty_dict.get('username', '').strip() if warranty_dict.get('username') else ''
-                
-                if first_name and last_name:
-                    warranty_dict['user_display_name'] = f"{first_name} {last_name}"
-                elif first_name:
-                    warranty_dict['user_display_name'] = first_name
-                elif username:
-                    warranty_dict['user_display_name'] = username
-                else:
-                    warranty_dict['user_display_name'] = 'Unknown User'
-                
-                warranties_list.append(warranty_dict)
-                
-            return jsonify(warranties_list)
+        # Get all warranties from all users with user information (exclude archived by default)
+        query = '''
+            SELECT 
+                w.id, w.product_name, w.purchase_date, w.expiration_date, w.invoice_path, w.manual_path, w.other_document_path, 
+                w.product_url, w.notes, w.purchase_price, w.user_id, w.created_at, w.updated_at, w.is_lifetime, 
+                w.vendor, w.warranty_type, w.warranty_duration_years, w.warranty_duration_months, w.warranty_duration_days, w.product_photo_path, w.currency,
+                w.paperless_invoice_id, w.paperless_manual_id, w.paperless_photo_id, w.paperless_other_id,
+                w.invoice_url, w.manual_url, w.other_document_url,
+                u.username, u.email, u.first_name, u.last_name,
+                w.claim_status_summary
+            FROM warranties w
+            JOIN users u ON w.user_id = u.id
+            WHERE w.archived_at IS NULL
+            ORDER BY u.username, CASE WHEN w.is_lifetime THEN 1 ELSE 0 END, w.expiration_date NULLS LAST, w.product_name
+        '''
+        # Ownership of conn passes to the streamed response, which releases it when closed
+        response = stream_warranty_list(conn, 'admin_warranties_stream', query)
+        conn = None
+        return response
     except Exception as e:
         logger.error(f"Error retrieving all warranties: {e}")
         return jsonify({"error": "Failed to retrieve all warranties"}), 500
@@ -1569,102 +1886,40 @@ def get_global_warranties():
         # Check if global view is enabled for this user
         user_is_admin = request.user.get('is_admin', False)
         
+        # Get both global view settings (cached)
+        settings = get_site_settings()
+        
+        # Check if global view is enabled at all
+        global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
+        if not global_view_enabled:
+            return jsonify({"error": "Global view is disabled by administrator"}), 403
+        
+        # Check if global view is restricted to admins only
+        admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
+        if admin_only and not user_is_admin:
+            return jsonify({"error": "Global view is restricted to administrators only"}), 403
+        
         conn = get_db_connection()
-        with conn.cursor() as cur:
-            # Get both global view settings
-            cur.execute("SELECT key, value FROM site_settings WHERE key IN ('global_view_enabled', 'global_view_admin_only')")
-            settings = {row[0]: row[1] for row in cur.fetchall()}
-            
-            # Check if global view is enabled at all
-            global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
-            if not global_view_enabled:
-                return jsonify({"error": "Global view is disabled by administrator"}), 403
-            
-            # Check if global view is restricted to admins only
-            admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
-            if admin_only and not user_is_admin:
-                return jsonify({"error": "Global view is restricted to administrators only"}), 403
         
-        # Release the connection since we'll get a new one below
-        release_db_connection(conn)
+        # Get all warranties from all users with user information (exclude archived for default view)
+        query = '''
+            SELECT 
+                w.id, w.product_name, w.purchase_date, w.expiration_date, w.invoice_path, w.manual_path, w.other_document_path, 
+                w.product_url, w.notes, w.purchase_price, w.user_id, w.created_at, w.updated_at, w.is_lifetime, 
+                w.vendor, w.warranty_type, w.warranty_duration_years, w.warranty_duration_months, w.warranty_duration_days, w.product_photo_path, w.currency,
+                w.paperless_invoice_id, w.paperless_manual_id, w.paperless_photo_id, w.paperless_other_id,
+                w.invoice_url, w.manual_url, w.other_document_url, w.model_number,
+                u.username, u.email, u.first_name, u.last_name,
+                w.claim_status_summary
+            FROM warranties w
+            JOIN users u ON w.user_id = u.id
+            WHERE w.archived_at IS NULL
+            ORDER BY u.username, CASE WHEN w.is_lifetime THEN 1 ELSE 0 END, w.expiration_date NULLS LAST, w.product_name
+        '''
+        # Ownership of conn passes to the streamed response, which releases it when closed
+        response = stream_warranty_list(conn, 'global_warranties_stream', query)
         conn = None
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            # Get all warranties from all users with user information (exclude archived for default view)
-            # Use correlated subqueries for claim status to avoid GROUP BY collapsing or miscounting
-            cur.execute('''
-                SELECT 
-                    w.id, w.product_name, w.purchase_date, w.expiration_date, w.invoice_path, w.manual_path, w.other_document_path, 
-                    w.product_url, w.notes, w.purchase_price, w.user_id, w.created_at, w.updated_at, w.is_lifetime, 
-                    w.vendor, w.warranty_type, w.warranty_duration_years, w.warranty_duration_months, w.warranty_duration_days, w.product_photo_path, w.currency,
-                    w.paperless_invoice_id, w.paperless_manual_id, w.paperless_photo_id, w.paperless_other_id,
-                    w.invoice_url, w.manual_url, w.other_document_url, w.model_number,
-                    u.username, u.email, u.first_name, u.last_name,
-                    CASE
-                        WHEN EXISTS (
-                            SELECT 1 FROM warranty_claims c 
-                            WHERE c.warranty_id = w.id AND c.status IN ('Submitted', 'In Progress')
-                        ) THEN 'OPEN'
-                        WHEN EXISTS (
-                            SELECT 1 FROM warranty_claims c 
-                            WHERE c.warranty_id = w.id
-                        ) THEN 'FINISHED'
-                        ELSE 'NO_CLAIMS'
-                    END AS claim_status_summary
-                FROM warranties w
-                JOIN users u ON w.user_id = u.id
-                WHERE w.archived_at IS NULL
-                ORDER BY u.username, CASE WHEN w.is_lifetime THEN 1 ELSE 0 END, w.expiration_date NULLS LAST, w.product_name
-            ''')
-                
-            warranties = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
-            warranties_list = []
-            
-            for row in warranties:
-                warranty_dict = dict(zip(columns, row))
-                # Convert date objects to ISO format strings for JSON serialization
-                for key, value in warranty_dict.items():
-                    if isinstance(value, (datetime, date)):
-                        warranty_dict[key] = value.isoformat()
-                    # Convert Decimal objects to float for JSON serialization
-                    elif isinstance(value, Decimal):
-                        warranty_dict[key] = float(value)
-                
-                # Get serial numbers for this warranty
-                warranty_id = warranty_dict['id']
-                cur.execute('SELECT serial_number FROM serial_numbers WHERE warranty_id = %s', (warranty_id,))
-                serial_numbers = [row[0] for row in cur.fetchall()]
-                warranty_dict['serial_numbers'] = serial_numbers
-                
-                # Get tags for this warranty
-                cur.execute('''
-                    SELECT t.id, t.name, t.color
-                    FROM tags t
-                    JOIN warranty_tags wt ON t.id = wt.tag_id
-                    WHERE wt.warranty_id = %s
-                    ORDER BY t.name
-                ''', (warranty_id,))
-                tags = [{'id': t[0], 'name': t[1], 'color': t[2]} for t in cur.fetchall()]
-                warranty_dict['tags'] = tags
-                
-                # Add user display name for better UI
-                first_name = warranty_dict.get('first_name', '').strip() if warranty_dict.get('first_name') else ''
-                last_name = warranty_dict.get('last_name', '').strip() if warranty_dict.get('last_name') else ''
-                username = warranty_dict.get('username', '').strip() if warranty_dict.get('username') else ''
-                
-                if first_name and last_name:
-                    warranty_dict['user_display_name'] = f"{first_name} {last_name}"
-                elif first_name:
-                    warranty_dict['user_display_name'] = first_name
-                elif username:
-                    warranty_dict['user_display_name'] = username
-                else:
-                    warranty_dict['user_display_name'] = 'Unknown User'
-                
-                warranties_list.append(warranty_dict)
-                
-            return jsonify(warranties_list)
+        return response
     except Exception as e:
         logger.error(f"Error retrieving global warranties: {e}")
         return jsonify({"error": "Failed to retrieve global warranties"}), 500
@@ -1682,102 +1937,40 @@ def get_global_warranties_archived():
         # Check if global view is enabled for this user
         user_is_admin = request.user.get('is_admin', False)
 
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            # Get both global view settings
-            cur.execute("SELECT key, value FROM site_settings WHERE key IN ('global_view_enabled', 'global_view_admin_only')")
-            settings = {row[0]: row[1] for row in cur.fetchall()}
-
-            # Check if global view is enabled at all
-            global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
-            if not global_view_enabled:
-                return jsonify({"error": "Global view is disabled by administrator"}), 403
+        # Get both global view settings (cached)
+        settings = get_site_settings()
 
-            # Check if global view is restricted to admins only
-            admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
-            if admin_only and not user_is_admin:
-                return jsonify({"error": "Global view is restricted to administrators only"}), 403
+        # Check if global view is enabled at all
+        global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
+        if not global_view_enabled:
+            return jsonify({"error": "Global view is disabled by administrator"}), 403
 
-        # Release the connection since we'll get a new one below
-        release_db_connection(conn)
-        conn = None
+        # Check if global view is restricted to admins only
+        admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
+        if admin_only and not user_is_admin:
+            return jsonify({"error": "Global view is restricted to administrators only"}), 403
+        
         conn = get_db_connection()
-        with conn.cursor() as cur:
-            # Get archived warranties from all users with user information
-            # Use correlated subqueries for claim status to avoid GROUP BY collapsing or miscounting
-            cur.execute('''
-                SELECT 
-                    w.id, w.product_name, w.purchase_date, w.expiration_date, w.invoice_path, w.manual_path, w.other_document_path, 
-                    w.product_url, w.notes, w.purchase_price, w.user_id, w.created_at, w.updated_at, w.is_lifetime, 
-                    w.vendor, w.warranty_type, w.warranty_duration_years, w.warranty_duration_months, w.warranty_duration_days, w.product_photo_path, w.currency,
-                    w.paperless_invoice_id, w.paperless_manual_id, w.paperless_photo_id, w.paperless_other_id,
-                    w.invoice_url, w.manual_url, w.other_document_url, w.model_number,
-                    u.username, u.email, u.first_name, u.last_name,
-                    CASE
-                        WHEN EXISTS (
-                            SELECT 1 FROM warranty_claims c 
-                            WHERE c.warranty_id = w.id AND c.status IN ('Submitted', 'In Progress')
-                        ) THEN 'OPEN'
-                        WHEN EXISTS (
-                            SELECT 1 FROM warranty_claims c 
-                            WHERE c.warranty_id = w.id
-                        ) THEN 'FINISHED'
-                        ELSE 'NO_CLAIMS'
-                    END AS claim_status_summary
-                FROM warranties w
-                JOIN users u ON w.user_id = u.id
-                WHERE w.archived_at IS NOT NULL
-                ORDER BY w.archived_at DESC NULLS LAST, w.updated_at DESC NULLS LAST, w.product_name
-            ''')
-
-            warranties = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
-            warranties_list = []
-
-            for row in warranties:
-                warranty_dict = dict(zip(columns, row))
-                # Convert date objects to ISO format strings for JSON serialization
-                for key, value in warranty_dict.items():
-                    if isinstance(value, (datetime, date)):
-                        warranty_dict[key] = value.isoformat()
-                    # Convert Decimal objects to float for JSON serialization
-                    elif isinstance(value, Decimal):
-                        warranty_dict[key] = float(value)
-
-                # Get serial numbers for this warranty
-                warranty_id = warranty_dict['id']
-                cur.execute('SELECT serial_number FROM serial_numbers WHERE warranty_id = %s', (warranty_id,))
-                serial_numbers = [row[0] for row in cur.fetchall()]
-                warranty_dict['serial_numbers'] = serial_numbers
-
-                # Get tags for this warranty
-                cur.execute('''
-                    SELECT t.id, t.name, t.color
-                    FROM tags t
-                    JOIN warranty_tags wt ON t.id = wt.tag_id
-                    WHERE wt.warranty_id = %s
-                    ORDER BY t.name
-                ''', (warranty_id,))
-                tags = [{'id': t[0], 'name': t[1], 'color': t[2]} for t in cur.fetchall()]
-                warranty_dict['tags'] = tags
-
-                # Add user display name for better UI
-                first_name = warranty_dict.get('first_name', '').strip() if warranty_dict.get('first_name') else ''
-                last_name = warranty_dict.get('last_name', '').strip() if warranty_dict.get('last_name') else ''
-                username = warranty_dict.get('username', '').strip() if warranty_dict.get('username') else ''
-
-                if first_name and last_name:
-                    warranty_dict['user_display_name'] = f"{first_name} {last_name}"
-                elif first_name:
-                    warranty_dict['user_display_name'] = first_name
-                elif username:
-                    warranty_dict['user_display_name'] = username
-                else:
-                    warranty_dict['user_display_name'] = 'Unknown User'
-
-                warranties_list.append(warranty_dict)
 
-            return jsonify(warranties_list)
+        # Get archived warranties from all users with user information
+        query = '''
+            SELECT 
+                w.id, w.product_name, w.purchase_date, w.expiration_date, w.invoice_path, w.manual_path, w.other_document_path, 
+                w.product_url, w.notes, w.purchase_price, w.user_id, w.created_at, w.updated_at, w.is_lifetime, 
+                w.vendor, w.warranty_type, w.warranty_duration_years, w.warranty_duration_months, w.warranty_duration_days, w.product_photo_path, w.currency,
+                w.paperless_invoice_id, w.paperless_manual_id, w.paperless_photo_id, w.paperless_other_id,
+                w.invoice_url, w.manual_url, w.other_document_url, w.model_number,
+                u.username, u.email, u.first_name, u.last_name,
+                w.claim_status_summary
+            FROM warranties w
+            JOIN users u ON w.user_id = u.id
+            WHERE w.archived_at IS NOT NULL
+            ORDER BY w.archived_at DESC NULLS LAST, w.updated_at DESC NULLS LAST, w.product_name
+        '''
+        # Ownership of conn passes to the streamed response, which releases it when closed
+        response = stream_warranty_list(conn, 'global_archived_warranties_stream', query)
+        conn = None
+        return response
     except Exception as e:
         logger.error(f"Error retrieving archived global warranties: {e}")
         return jsonify({"error": "Failed to retrieve archived global warranties"}), 500
@@ -1930,17 +2123,8 @@ def get_warranty_debug(warranty_id):
             if not warranty:
                 return jsonify({"error": "Warranty not found or you don't have permission to access it"}), 404
             
-            # Convert to dictionary
-            columns = [desc[0] for desc in cur.description]
-            warranty_dict = dict(zip(columns, warranty))
-            
-            # Convert date objects to ISO format strings for JSON serialization
-            for key, value in warranty_dict.items():
-                if isinstance(value, (datetime, date)):
-                    warranty_dict[key] = value.isoformat()
-                # Convert Decimal objects to float for JSON serialization
-                elif isinstance(value, Decimal):
-                    warranty_dict[key] = float(value)
+            # Convert to a JSON-ready dictionary
+            warranty_dict = row_to_dict(cur, warranty)
             
             # Get serial numbers for this warranty
             cur.execute('SELECT serial_number FROM serial_numbers WHERE warranty_id = %s', (warranty_id,))
@@ -2182,6 +2366,8 @@ def create_claim(warranty_id):
         created_at = result[1]
         updated_at = result[2]
         
+        touch_warranty(cur, warranty_id)
+        bump_user_data_version(cur, user_id)
         conn.commit()
         
         # Return the created claim
@@ -2238,8 +2424,7 @@ def get_claims(warranty_id):
         # If user doesn't own the warranty, check if global view access is allowed
         if not warranty:
             # Check if global view is enabled and user has access
-            cur.execute("SELECT key, value FROM site_settings WHERE key IN ('global_view_enabled', 'global_view_admin_only')")
-            settings = {row[0]: row[1] for row in cur.fetchall()}
+            settings = get_site_settings()
             
             global_view_enabled = settings.get('global_view_enabled', 'true').lower() == 'true'
             admin_only = settings.get('global_view_admin_only', 'false').lower() == 'true'
@@ -2380,6 +2565,8 @@ def update_claim(warranty_id, claim_id):
               parsed_resolution_date, claim_id, warranty_id))
         
         updated_at = cur.fetchone()[0]
+        touch_warranty(cur, warranty_id)
+        bump_user_data_version(cur, user_id)
         conn.commit()
         
         # Return updated claim
@@ -2443,6 +2630,8 @@ def delete_claim(warranty_id, claim_id):
         if cur.rowcount == 0:
             return jsonify({'error': 'Claim not found'}), 404
         
+        touch_warranty(cur, warranty_id)
+        bump_user_data_version(cur, user_id)
         conn.commit()
         
         logger.info(f"Deleted claim {claim_id} for warranty {warranty_id} by user {user_id}")
@@ -8,6 +8,7 @@ class AuthManager {
         this.token = null;
         this.currentUser = null;
         this.onLogoutCallbacks = [];
+        this.refreshTimer = null;
 
         // Initial state load from localStorage
         this.token = localStorage.getItem('auth_token');
@@ -44,12 +45,70 @@ class AuthManager {
     clearAuthData() {
         console.log('[Auth.js] Clearing auth data.');
         localStorage.removeItem('auth_token');
+        localStorage.removeItem('refresh_token');
         localStorage.removeItem('user_info');
+        if (this.refreshTimer) {
+            clearTimeout(this.refreshTimer);
+            this.refreshTimer = null;
+        }
         this.token = null;
         this.currentUser = null;
         this.onLogoutCallbacks.forEach(cb => cb());
     }
     
+    // Stateless token mode: the server returns a short-lived access token plus a
+    // refresh_token. Renew the access token shortly before it expires.
+    _tokenExpiresAt(token) {
+        try {
+            const payload = JSON.parse(atob(token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/')));
+            return payload.exp ? payload.exp * 1000 : null;
+        } catch (e) {
+            return null;
+        }
+    }
+
+    async refreshAccessToken() {
+        const refreshToken = localStorage.getItem('refresh_token');
+        if (!refreshToken) return false;
+        try {
+            const response = await fetch('/api/auth/refresh', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ refresh_token: refreshToken })
+            });
+            if (!response.ok) {
+                console.warn(`[Auth.js] Token refresh failed (status: ${response.status}).`);
+                return false;
+            }
+            const data = await response.json();
+            this.token = data.token;
+            localStorage.setItem('auth_token', this.token);
+            this.scheduleTokenRefresh();
+            return true;
+        } catch (error) {
+            console.error('[Auth.js] Error refreshing access token:', error);
+            return false;
+        }
+    }
+
+    async refreshAccessTokenIfNeeded() {
+        if (!this.token || !localStorage.getItem('refresh_token')) return;
+        const expiresAt = this._tokenExpiresAt(this.token);
+        if (expiresAt && expiresAt - Date.now() < 60000) {
+            await this.refreshAccessToken();
+        }
+    }
+
+    scheduleTokenRefresh() {
+        if (this.refreshTimer) clearTimeout(this.refreshTimer);
+        this.refreshTimer = null;
+        if (!this.token || !localStorage.getItem('refresh_token')) return;
+        const expiresAt = this._tokenExpiresAt(this.token);
+        if (!expiresAt) return;
+        const delay = Math.max(expiresAt - Date.now() - 60000, 0);
+        this.refreshTimer = setTimeout(() => this.refreshAccessToken(), delay);
+    }
+
     onLogout(callback) {
         if (typeof callback === 'function') {
             this.onLogoutCallbacks.push(callback);
@@ -59,6 +118,7 @@ class AuthManager {
     async checkAuthState(isInitialLoad = false) {
         console.log('[Auth.js] checkAuthState called. Initial load:', isInitialLoad);
         this.token = localStorage.getItem('auth_token'); // Re-read token, might have changed (e.g. by auth-redirect.js)
+        await this.refreshAccessTokenIfNeeded();
         const userInfoString = localStorage.getItem('user_info');
         
         this.currentUser = null; // Reset before check
@@ -88,6 +148,7 @@ class AuthManager {
                     if (data.valid && data.user && data.user.id) {
                         this.currentUser = data.user;
                         localStorage.setItem('user_info', JSON.stringify(this.currentUser)); // Ensure localStorage is up-to-date
+                        this.scheduleTokenRefresh();
                         console.log('[Auth.js] Token validated, user_info updated/confirmed:', this.currentUser);
                     } else {
                         console.warn('[Auth.js] Token validation failed or user data invalid from API. Clearing auth data.');
@@ -204,7 +265,9 @@ class AuthManager {
                 this.token = data.token;
                 this.currentUser = data.user;
                 localStorage.setItem('auth_token', this.token);
+                if (data.refresh_token) localStorage.setItem('refresh_token', data.refresh_token);
                 localStorage.setItem('user_info', JSON.stringify(this.currentUser));
+                this.scheduleTokenRefresh();
                 this.updateUIBasedOnAuthState();
                 return data; // Return data for login.js to handle redirect
             } else {
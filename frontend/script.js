@@ -4778,9 +4778,7 @@ function openSecureFile(filePath) {
     fetchWithRetry(`/api/secure-file/${fileName}`, {
         method: 'GET',
         headers: {
-            'Authorization': `Bearer ${token}`,
-            'Cache-Control': 'no-cache, no-store, must-revalidate',
-            'Pragma': 'no-cache'
+            'Authorization': `Bearer ${token}`
         }
     })
     .then(blob => {